@@ -1,22 +1,36 @@
 from __future__ import absolute_import
+from copy import copy
 import difflib
 from functools import wraps, partial
 import re
-from flask import request, url_for, current_app
+import threading
+from flask import request, url_for, current_app, has_request_context, _request_ctx_stack
 from flask import abort as original_flask_abort
+try:
+    from flask import has_app_context
+except ImportError:
+    # Flask < 0.9: the application is only bound within a request
+    has_app_context = has_request_context
 from flask.views import MethodView
 from flask.signals import got_request_exception
 from werkzeug.exceptions import HTTPException, MethodNotAllowed, NotFound
 from werkzeug.http import HTTP_STATUS_CODES
 from werkzeug.wrappers import Response as ResponseBase
-from flask.ext.restful.utils import error_data, unpack, OrderedDict
-from flask.ext.restful.representations.json import output_json
+from flask.ext.restful.utils import error_data, unpack, OrderedDict, LRUCache
+# Imported by their real name, so that the fields share the module's state
+from flask_restful.utils import profiling, KeyValuePairs
+from flask.ext.restful.representations.json import (output_json, RawJSON, json_encoder,
+                                                    string_encoder, encode_json, mark_pairs)
+import six
 import sys
 from flask.helpers import _endpoint_from_view_func
 from types import MethodType
 
 
-__all__ = ('Api', 'Resource', 'marshal', 'marshal_with', 'marshal_with_field', 'abort')
+__all__ = ('Api', 'Resource', 'marshal', 'marshal_with', 'marshal_with_field',
+           'marshal_many', 'marshal_iter', 'compile_fields', 'Marshaller',
+           'project_fields', 'expand_fields', 'bind_fields', 'field_profile', 'MarshalCache',
+           'FieldProfileResource', 'abort')
 
 
 def abort(http_status_code, **kwargs):
@@ -536,16 +550,725 @@ class Resource(MethodView):
         return resp
 
 
-def marshal(data, fields, envelope=None):
+def _make(cls):
+    if isinstance(cls, type):
+        return cls()
+    return cls
+
+
+class Marshaller(object):
+    """A compiled marshalling plan for a dict of fields. Field classes are
+    instantiated and nested dicts are compiled once, so marshalling each
+    record only pays for the output of its fields. Build one with
+    :func:`compile_fields`.
+
+    :param fields: a dict of whose keys will make up the final serialized
+                   response output
+    :param envelope: optional key that will be used to envelop the serialized
+                     response
+    :param dict_class: the type of the marshalled records, at every level of
+                       nesting. Defaults to :attr:`Marshaller.dict_class`.
+    :param memo: whether :class:`~fields.Nested` fields marshal each
+                 sub-object only once per call. ``'share'`` reuses the first
+                 result wherever the sub-object appears again, ``'copy'`` (or
+                 ``True``) hands out a copy of it instead.
+    :param loader_pool: a thread pool (anything with a ``map`` method, such
+                        as a :class:`multiprocessing.pool.ThreadPool`) on
+                        which the batch calls of independent
+                        :class:`~fields.Loader` instances run concurrently
+    :param profile: whether to record the time spent in each field into the
+                    profile being recorded, see :ref:`field-profiling`
+
+    >>> from flask.ext.restful import fields, compile_fields
+    >>> marshaller = compile_fields({ 'a': fields.Raw })
+    >>> marshaller([{ 'a': 100, 'b': 'foo' }, { 'a': 200 }])
+    [OrderedDict([('a', 100)]), OrderedDict([('a', 200)])]
+
+    """
+
+    #: The type of the marshalled records, unless one is passed explicitly.
+    #: Set it to ``dict`` or :class:`~utils.KeyValuePairs` to change the
+    #: default for the whole application.
+    dict_class = OrderedDict
+
+    #: Lists shorter than this are marshalled on the calling thread, even
+    #: when workers are requested (see :meth:`parallel`)
+    parallel_threshold = 1000
+
+    _json = (None, None)
+    _batched = None
+    _profiled = None
+    _bound = None
+    # Whether the fields read rows by position (see bind)
+    _reads_rows = False
+
+    def __init__(self, fields, envelope=None, dict_class=None, memo=None, loader_pool=None,
+                 profile=False):
+        if memo is True:
+            memo = 'copy'
+        if memo not in (None, False, 'copy', 'share'):
+            raise ValueError("memo must be one of 'copy' or 'share'")
+        self.fields = fields
+        self.envelope = envelope
+        self.memo = memo or None
+        self.profile = bool(profile)
+        self.options = {'dict_class': dict_class, 'memo': self.memo, 'loader_pool': loader_pool,
+                        'profile': self.profile}
+        if dict_class is not None:
+            self.dict_class = dict_class
+        self.compiled = [(key, compile_fields(field, **self.options) if isinstance(field, dict)
+                          else _make(field).inherit(self.options))
+                         for key, field in fields.items()]
+        self.plan = []
+        self.column_plan = []
+        for key, field in self.compiled:
+            if isinstance(field, Marshaller):
+                self.plan.append((key, field))
+                self.column_plan.append((key, field.marshal_columns))
+            else:
+                self.plan.append((key, field.output_function(key)))
+                self.column_plan.append((key, partial(field.output_many, key)))
+        if self.profile:
+            self._time_plans()
+        # The fields whose values are looked up by a loader, at this level
+        self.loaded = [(key, field) for key, field in self.compiled
+                       if getattr(field, 'loader', None) is not None and
+                       not getattr(field, 'expand_only', False)]
+        #: Whether records are :class:`~utils.KeyValuePairs` at any level,
+        #: which the JSON representation is told about when marshalling
+        self.pairs = self.dict_class is KeyValuePairs or _any_field(fields, _makes_pairs, set())
+
+    def _time_plans(self):
+        # Wraps every field in a timer, labelled with the field's key and
+        # class. List fields mark their items with [] in the path.
+        plans = []
+        for (key, field), (_, output), (_, output_many) in zip(self.compiled, self.plan,
+                                                               self.column_plan):
+            label = 'dict' if isinstance(field, Marshaller) else type(field).__name__
+            segments = (key, '[]') if hasattr(field, 'container') else (key,)
+            plans.append(((key, profiling.timed(segments, label, output)),
+                          (key, profiling.timed(segments, label, output_many, per_row=True))))
+        self.plan = [timed for timed, _ in plans]
+        self.column_plan = [timed_many for _, timed_many in plans]
+
+    def profiled(self):
+        """Returns the variant of this marshaller which records the time
+        spent in each field, see :ref:`field-profiling`. It is compiled once,
+        on first use."""
+        if self.profile:
+            return self
+        if self._profiled is None:
+            self._profiled = Marshaller(self.fields, self.envelope,
+                                        **dict(self.options, profile=True))
+            self._profiled._reads_rows = self._reads_rows
+        return self._profiled
+
+    def bind(self, columns):
+        """Returns a marshaller for rows with the given columns, reading the
+        fields by position (see :func:`bind_fields`). Marshallers are bound
+        once per list of column names, and reused.
+
+        :param columns: the column names in order, a cursor's
+                        ``description``, or a namedtuple class
+        """
+        indexes = _column_indexes(columns)
+        key = tuple(sorted(indexes.items()))
+        if self._bound is None:
+            self._bound = LRUCache(16)
+        marshaller = self._bound.get(key)
+        if marshaller is None:
+            marshaller = Marshaller(_bind(self.fields, indexes), self.envelope, **self.options)
+            marshaller._reads_rows = True
+            self._bound.set(key, marshaller)
+        return marshaller
+
+    @property
+    def batched(self):
+        """Whether any of the fields, at any depth, has a
+        :class:`~fields.Loader`. Lists are then marshalled column by column
+        (see :meth:`marshal_columns`), so that each loader is called once per
+        column instead of once per object."""
+        if self._batched is None:
+            self._batched = _any_field(self.fields, _has_loader, set())
+        return self._batched
+
+    def is_list(self, data):
+        """Whether data is a list of records rather than a single record.
+        Lists and tuples are lists of records, except for marshallers bound
+        to columns (see :meth:`bind`): a namedtuple is then a single row, and
+        so is a tuple unless all its items are rows themselves.
+
+        :param data: the actual object(s) from which the fields are taken from
+        """
+        if not isinstance(data, (list, tuple)):
+            return False
+        return not self._reads_rows or _holds_rows(data)
+
+    def envelop(self, items):
+        """Wraps marshalled records in the envelope, if any"""
+        return self.dict_class([(self.envelope, items)]) if self.envelope else items
+
+    def marshal_one(self, obj):
+        """Marshals a single record, without any envelope"""
+        return self.dict_class([(key, output(obj)) for key, output in self.plan])
+
+    def marshal_columns(self, rows):
+        """Marshals a sequence of records a column at a time: each field pulls
+        its values for all the records, then formats them in one pass. Returns
+        a list of records, without any envelope.
+
+        :param rows: a sequence of records, or a NumPy structured array
+        """
+        keys = [key for key, _ in self.column_plan]
+        dict_class = self.dict_class
+        if not keys:
+            return [dict_class() for _ in rows]
+        primed = self._prefetch(rows)
+        try:
+            columns = [output_many(rows) for _, output_many in self.column_plan]
+        finally:
+            for loader in primed:
+                loader.prime(None)
+        return [dict_class(zip(keys, values)) for values in zip(*columns)]
+
+    def _prefetch(self, rows):
+        # Runs the batch calls of the loaders of this level concurrently on
+        # the loader pool, and primes the loaders with the results. Rendering
+        # stays on the calling thread.
+        pool = self.options['loader_pool']
+        if pool is None or len(self.loaded) < 2:
+            return []
+        keys = OrderedDict()
+        for key, field in self.loaded:
+            column = field.accessor(key).column(rows)
+            keys.setdefault(field.loader, []).extend(
+                column.tolist() if hasattr(column, 'tolist') else column)
+        loaders = list(keys)
+        if len(loaders) < 2:
+            return []
+        for loader, loaded in zip(loaders, pool.map(lambda loader: loader.fetch(keys[loader]),
+                                                    loaders)):
+            loader.prime(loaded)
+        return loaders
+
+    def many(self, rows):
+        """Marshals a sequence of records column by column, see
+        :func:`marshal_many`"""
+        if self.memo and _memo.table is None:
+            return _memoized(self.many, rows)
+        if self.pairs:
+            mark_pairs()
+        if not isinstance(rows, (list, tuple)) and not hasattr(rows, 'dtype'):
+            rows = list(rows)
+        if self.profile:
+            with profiling.scope(self.envelope, '[]'):
+                items = self.marshal_columns(rows)
+        else:
+            items = self.marshal_columns(rows)
+        return self.dict_class([(self.envelope, items)]) if self.envelope else items
+
+    def parallel(self, data, workers):
+        """Marshals a list of records in chunks on a pool of workers. The
+        output is the same as :meth:`__call__`, in the same order. Lists
+        shorter than :attr:`parallel_threshold` are marshalled serially.
+
+        Worker threads run inside a copy of the current request context, so
+        fields such as :class:`~fields.Url` keep working. Before Flask 0.10,
+        which can't copy it, lists are marshalled on the calling thread
+        within a request. CPython threads
+        only run one at a time, so threads only help fields which wait on
+        I/O, such as loaders querying a backend: fields that only compute are
+        no faster, or slower. To use several cores, pass a process pool. The
+        fields and records must then be picklable, and fields that need a
+        request can't be used.
+
+        :param data: a sequence of records
+        :param workers: the number of worker threads, or a pool with a ``map``
+                        method (e.g. a :class:`multiprocessing.pool.Pool`, a
+                        ``ThreadPool`` or a ``concurrent.futures`` executor)
+        """
+        if not isinstance(data, (list, tuple)):
+            data = list(data)
+        if self.pairs:
+            mark_pairs()
+        pool, threads, count = _worker_pool(workers)
+        if len(data) < self.parallel_threshold or count < 2:
+            return self(data)
+        size = max(self.parallel_threshold // 4, -(-len(data) // (count * 4)))
+        chunks = [data[i:i + size] for i in range(0, len(data), size)]
+        marshal = partial(_marshal_chunk, self)
+        if threads and has_request_context():
+            ctx = _request_ctx_stack.top
+            if not hasattr(ctx, 'copy'):
+                # Flask < 0.10 can't copy the request context for the threads
+                return self(data)
+            marshal = _in_context_copy(ctx, marshal)
+        items = []
+        for chunk in pool.map(marshal, chunks):
+            items.extend(chunk)
+        return self.dict_class([(self.envelope, items)]) if self.envelope else items
+
+    def __getstate__(self):
+        # Compiled plans hold bound methods and closures: ship the fields and
+        # options, and compile them again on the other side
+        options = dict(self.options, loader_pool=None)
+        return {'fields': self.fields, 'envelope': self.envelope, 'options': options}
+
+    def __setstate__(self, state):
+        self.__init__(state['fields'], state['envelope'], **state['options'])
+
+    def iter(self, data):
+        """Lazily marshals an iterable of records, see :func:`marshal_iter`"""
+        if self.pairs:
+            mark_pairs()
+        marshal_one = self.marshal_one
+        items = (marshal_one(d) for d in data)
+        return self.dict_class([(self.envelope, items)]) if self.envelope else items
+
+    def json_encoder(self, encoder, record=False):
+        """Returns a function encoding data with the fields straight to JSON
+        text, without any envelope. The function is compiled for the given
+        :class:`json.JSONEncoder` and reused while the same encoder is passed.
+
+        :param encoder: The JSON encoder to use for values without a shortcut
+        :param record: Whether the function encodes a single record, even if
+                       it is a list or tuple
+        """
+        cached, encoders = self._json
+        if cached is not encoder:
+            encoders = self._compile_json(encoder)
+            self._json = (encoder, encoders)
+        return encoders[1] if record else encoders[0]
+
+    def _compile_json(self, encoder):
+        quote = string_encoder(encoder)
+        compiled = sorted(self.compiled, key=lambda item: item[0]) if encoder.sort_keys else self.compiled
+        plan = [(quote(six.text_type(key)) + encoder.key_separator,
+                 field.json_encoder(encoder) if isinstance(field, Marshaller)
+                 else field.json_output(key, encoder))
+                for key, field in compiled]
+        separator = encoder.item_separator
+
+        def encode_one(obj):
+            return '{' + separator.join([prefix + output(obj) for prefix, output in plan]) + '}'
+
+        is_list = self.is_list
+
+        def encode(data):
+            if is_list(data):
+                return '[' + separator.join([encode(d) if _is_sublist(is_list, d) else encode_one(d)
+                                             for d in data]) + ']'
+            return encode_one(data)
+        return encode, encode_one
+
+    def encode(self, data, encoder=None):
+        """Marshals data straight to JSON bytes, without building the
+        intermediate dicts. Keys are escaped once, and each field encodes its
+        values according to its type. The result is the same as encoding the
+        output of :meth:`__call__`.
+
+        :param data: the actual object(s) from which the fields are taken from
+        :param encoder: the :class:`json.JSONEncoder` to use for values
+                        without a shortcut; defaults to one configured with
+                        :data:`representations.json.settings`
+        """
+        if self.memo and _memo.table is None:
+            return _memoized(self.encode, data, encoder)
+        if encoder is None:
+            encoder = json_encoder()
+        if self.profile:
+            # Fields are only timed when they output dicts
+            return encode_json(self(data), encoder).encode('utf-8')
+        if self.batched and self.is_list(data):
+            text = encode_json(self._marshal(data), encoder)
+        else:
+            text = self.json_encoder(encoder)(data)
+        if self.envelope:
+            text = '{%s%s%s}' % (string_encoder(encoder)(six.text_type(self.envelope)),
+                                 encoder.key_separator, text)
+        return text.encode('utf-8')
+
+    def encode_each(self, rows, encoder=None):
+        """Encodes each record of a sequence to JSON text on its own, like
+        :meth:`encode` but without the envelope. Returns a list of texts.
+
+        :param rows: a sequence of records
+        :param encoder: the :class:`json.JSONEncoder` to use, see :meth:`encode`
+        """
+        if self.memo and _memo.table is None:
+            return _memoized(self.encode_each, rows, encoder)
+        if encoder is None:
+            encoder = json_encoder()
+        if self.batched or self.profile:
+            return [encode_json(record, encoder) for record in self._marshal(list(rows))]
+        encode_one = self.json_encoder(encoder, record=True)
+        return [encode_one(row) for row in rows]
+
+    def __call__(self, data):
+        if self.memo and _memo.table is None:
+            return _memoized(self.__call__, data)
+        if self.pairs:
+            mark_pairs()
+        if self.profile:
+            with profiling.scope(self.envelope, '[]' if self.is_list(data) else None):
+                items = self._marshal(data)
+        else:
+            items = self._marshal(data)
+        return self.dict_class([(self.envelope, items)]) if self.envelope else items
+
+    def _marshal(self, data):
+        if not self.is_list(data):
+            return self.marshal_one(data)
+        is_list = self.is_list
+        # Items which are lists themselves are marshalled as nested lists
+        if self.batched and not any(_is_sublist(is_list, d) for d in data):
+            return self.marshal_columns(data)
+        marshal_one = self.marshal_one
+        return [self._marshal(d) if _is_sublist(is_list, d) else marshal_one(d) for d in data]
+
+
+def _is_sublist(is_list, item):
+    # Whether an item of a list is a list of records itself. Namedtuples are
+    # records.
+    return (isinstance(item, list) or type(item) is tuple) and is_list(item)
+
+
+class MarshalCache(object):
+    """A cache of marshalled records, for objects which are marshalled over
+    and over between changes. Each record is stored under the schema it was
+    marshalled with and the key of its object, along with the object's
+    version: a record is reused while the object keeps the same version, and
+    marshalled again once it changes. Pass the cache to :func:`marshal` or
+    :class:`marshal_with`; objects without a key (or without a version, if
+    one is declared) are always marshalled. With ``encode``,
+    :class:`marshal_with` caches the JSON of each object instead, and
+    responses with lists are assembled from the cached fragments.
+
+    Records are shared between all the calls that hit the cache, and must not
+    be modified. The least recently used records are dropped once the cache
+    is full.
+
+    :param maxsize: the maximum total size of the records
+    :param key: the attribute (or dict key) identifying an object, or a
+                function returning the key of an object
+    :param version: the attribute (or dict key) holding the version of an
+                    object, such as a modification time, or a function
+                    returning it. With None, records are only replaced when
+                    they are invalidated.
+    :param sizeof: a function returning the size of a marshalled record, or
+                   of the JSON bytes cached by :meth:`encode`. Defaults to 1
+                   per entry, so ``maxsize`` is the maximum number of
+                   entries.
+
+    >>> from flask.ext.restful import fields, marshal, MarshalCache
+    >>> cache = MarshalCache(key='id', version='version')
+    >>> marshal({'id': 1, 'version': 1, 'a': 100}, {'a': fields.Raw}, cache=cache)
+    OrderedDict([('a', 100)])
+    >>> cache.invalidate(1)
+
+    """
+
+    def __init__(self, maxsize=10000, key='id', version='version', sizeof=None):
+        self.maxsize = maxsize
+        self.key = _hook(key)
+        self.version = None if version is None else _hook(version)
+        self.sizeof = sizeof
+        #: The total size of the cached records
+        self.size = 0
+        self.hits = self.misses = 0
+        # (schema, key) -> (fields, version, record, size), least recently
+        # used first; and the schemas each key is cached for
+        self._entries = OrderedDict()
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def marshal(self, marshaller, data):
+        """Marshals data like the marshaller, taking the records of unchanged
+        objects from the cache. The other objects are marshalled together,
+        then cached.
+
+        :param marshaller: the compiled :class:`Marshaller`
+        :param data: an object or a list of objects
+        """
+        rows = data if marshaller.is_list(data) else [data]
+        if marshaller.pairs:
+            mark_pairs()
+        records = self._render(marshaller, (id(marshaller.fields), marshaller.dict_class), rows,
+                               partial(_marshal_chunk, marshaller))
+        return marshaller.envelop(records if rows is data else records[0])
+
+    def encode(self, marshaller, data, encoder=None):
+        """Marshals data straight to JSON bytes like the marshaller (see
+        :meth:`Marshaller.encode`), splicing in the cached JSON of the
+        unchanged objects. The other objects are marshalled and encoded
+        together, then cached.
+
+        :param marshaller: the compiled :class:`Marshaller`
+        :param data: an object or a list of objects
+        :param encoder: the :class:`json.JSONEncoder` to use, see
+                        :meth:`Marshaller.encode`
+        """
+        if encoder is None:
+            encoder = json_encoder()
+        rows = data if marshaller.is_list(data) else [data]
+
+        def encode(fresh):
+            return [text.encode('utf-8') for text in marshaller.encode_each(fresh, encoder)]
+        fragments = self._render(marshaller, (id(marshaller.fields), encoder), rows, encode)
+        if rows is data:
+            body = b'[' + encoder.item_separator.encode('utf-8').join(fragments) + b']'
+        else:
+            body = fragments[0]
+        if marshaller.envelope:
+            body = ('{%s%s' % (string_encoder(encoder)(six.text_type(marshaller.envelope)),
+                               encoder.key_separator)).encode('utf-8') + body + b'}'
+        return body
+
+    def _render(self, marshaller, schema, rows, render):
+        # Takes the values of the rows from the cache, renders the missing
+        # ones all at once, and caches them
+        fields, values, missing = marshaller.fields, [], []
+        with self._lock:
+            for i, row in enumerate(rows):
+                key = self.key(row)
+                version = None if self.version is None else self.version(row)
+                value = None
+                if key is not None and (version is not None or self.version is None):
+                    entry = self._entries.pop((schema, key), None)
+                    if entry is not None and entry[0] is fields and entry[1] == version:
+                        self._entries[(schema, key)] = entry
+                        value = entry[2]
+                        self.hits += 1
+                    elif entry is not None:
+                        self._drop(schema, key, entry)
+                    if value is None:
+                        missing.append((i, key, version))
+                values.append(value)
+            self.misses += len(missing)
+        fresh = [i for i, value in enumerate(values) if value is None]
+        if fresh:
+            for i, value in zip(fresh, render([rows[i] for i in fresh])):
+                values[i] = value
+            with self._lock:
+                for i, key, version in missing:
+                    self._store(schema, key, (fields, version, values[i]))
+        return values
+
+    def invalidate(self, key=None):
+        """Drops the records of an object, for every schema. Without a key,
+        drops all the records.
+
+        :param key: the key of the object, as returned by the ``key`` hook
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._schemas.clear()
+                self.size = 0
+                return
+            for schema in self._schemas.pop(key, ()):
+                entry = self._entries.pop((schema, key), None)
+                if entry is not None:
+                    self.size -= entry[3]
+
+    def _store(self, schema, key, entry):
+        size = 1 if self.sizeof is None else self.sizeof(entry[2])
+        if size > self.maxsize:
+            return
+        previous = self._entries.pop((schema, key), None)
+        if previous is not None:
+            self._drop(schema, key, previous)
+        self._entries[(schema, key)] = entry + (size,)
+        self._schemas.setdefault(key, set()).add(schema)
+        self.size += size
+        while self.size > self.maxsize:
+            (old_schema, old_key), old = self._entries.popitem(last=False)
+            self._drop(old_schema, old_key, old)
+
+    def _drop(self, schema, key, entry):
+        # Forgets an entry already taken out of the entries
+        self.size -= entry[3]
+        schemas = self._schemas.get(key)
+        if schemas is not None:
+            schemas.discard(schema)
+            if not schemas:
+                del self._schemas[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _cached(method, marshaller, data):
+    # Marshals through a cache method, timing the fields of the objects
+    # marshalled when profiling
+    if _profiling_fields():
+        return _profiled(method, marshaller.profiled(), data)
+    return method(marshaller, data)
+
+
+def _hook(spec):
+    # A function pulling an attribute or dict key off an object
+    if callable(spec):
+        return spec
+
+    def get(obj):
+        if isinstance(obj, dict):
+            return obj.get(spec)
+        return getattr(obj, spec, None)
+    return get
+
+
+class _Memo(threading.local):
+    # The sub-objects already marshalled by the memoizing call running in this
+    # thread, by (id(obj), schema). None outside of such a call.
+    table = None
+
+
+_memo = _Memo()
+
+
+def _memoized(method, *args):
+    _memo.table = {}
+    try:
+        return method(*args)
+    finally:
+        _memo.table = None
+
+
+def _marshal_chunk(marshaller, rows):
+    # Marshals a chunk of a list on a worker, without the envelope
+    if marshaller.memo and _memo.table is None:
+        return _memoized(_marshal_chunk, marshaller, rows)
+    return marshaller._marshal(rows)
+
+
+def _in_context_copy(ctx, func):
+    def run(*args):
+        with ctx.copy():
+            return func(*args)
+    return run
+
+
+_thread_pools = {}
+_thread_pools_lock = threading.Lock()
+
+
+def _worker_pool(workers):
+    # Returns the pool to run on, whether it runs threads, and its size
+    from multiprocessing.pool import ThreadPool
+    if isinstance(workers, six.integer_types):
+        with _thread_pools_lock:
+            pool = _thread_pools.get(workers)
+            if pool is None and workers > 1:
+                pool = _thread_pools[workers] = ThreadPool(workers)
+        return pool, True, workers
+    threads = isinstance(workers, ThreadPool)
+    try:
+        from concurrent.futures import ThreadPoolExecutor
+        threads = threads or isinstance(workers, ThreadPoolExecutor)
+    except ImportError:
+        pass
+    count = getattr(workers, '_processes', None) or getattr(workers, '_max_workers', None) or 4
+    return workers, threads, count
+
+
+def _any_field(fields, test, seen):
+    # Whether test holds for any of the fields, at any depth of nesting
+    if isinstance(fields, Marshaller):
+        fields = fields.fields
+    if id(fields) in seen:
+        return False
+    seen.add(id(fields))
+    for field in fields.values():
+        while hasattr(field, 'container'):
+            if test(field):
+                return True
+            field = field.container
+        if test(field):
+            return True
+        if isinstance(field, (dict, Marshaller)) or hasattr(field, 'nested'):
+            if _any_field(getattr(field, 'nested', field), test, seen):
+                return True
+    return False
+
+
+def _has_loader(field):
+    return getattr(field, 'loader', None) is not None
+
+
+def _is_expandable(field):
+    return getattr(field, 'expand_only', False)
+
+
+def _makes_pairs(field):
+    return getattr(field, 'dict_class', None) is KeyValuePairs
+
+
+def compile_fields(fields, envelope=None, dict_class=None, memo=None, loader_pool=None,
+                   profile=False):
+    """Compiles a dict of fields into a reusable :class:`Marshaller`. Passing
+    a :class:`Marshaller` returns it as-is, unless a different envelope or
+    option is requested.
+
+    :param fields: a dict of whose keys will make up the final serialized
+                   response output
+    :param envelope: optional key that will be used to envelop the serialized
+                     response
+    :param dict_class: the type of the marshalled records, see
+                       :class:`Marshaller`
+    :param memo: the sub-object memoization policy, see :class:`Marshaller`
+    :param loader_pool: the pool running batch loads, see :class:`Marshaller`
+    :param profile: whether to time each field, see :class:`Marshaller`
+    """
+    if isinstance(fields, Marshaller):
+        options = dict(fields.options)
+        if dict_class is not None:
+            options['dict_class'] = dict_class
+        if memo:
+            options['memo'] = 'copy' if memo is True else memo
+        if loader_pool is not None:
+            options['loader_pool'] = loader_pool
+        if profile:
+            options['profile'] = True
+        if options != fields.options:
+            return Marshaller(fields.fields, envelope or fields.envelope, **options)
+        if envelope is None or envelope == fields.envelope:
+            return fields
+        marshaller = copy(fields)
+        marshaller.envelope = envelope
+        marshaller._profiled = None
+        return marshaller
+    return Marshaller(fields, envelope, dict_class, memo, loader_pool, profile)
+
+
+def marshal(data, fields, envelope=None, dict_class=None, memo=None, loader_pool=None,
+            workers=None, cache=None, columns=None):
     """Takes raw data (in the form of a dict, list, object) and a dict of
     fields to output and filters the data based on those fields.
 
     :param data: the actual object(s) from which the fields are taken from
     :param fields: a dict of whose keys will make up the final serialized
-                   response output
+                   response output, or a compiled :class:`Marshaller`
     :param envelope: optional key that will be used to envelop the serialized
                      response
-
+    :param dict_class: the type of the marshalled records, e.g. ``dict`` or
+                       :class:`~utils.KeyValuePairs`. Defaults to
+                       :attr:`Marshaller.dict_class`, an ``OrderedDict``.
+    :param memo: marshal every sub-object of :class:`~fields.Nested` fields
+                 only once, see :class:`Marshaller`. Worth it when many
+                 records refer to the same few objects.
+    :param loader_pool: a thread pool on which the batch calls of
+                        independent :class:`~fields.Loader` instances run
+                        concurrently, see :class:`Marshaller`
+    :param workers: marshal large lists in chunks on this many threads (for
+                    fields waiting on I/O), or on the given pool (e.g. a
+                    process pool, to use several cores), see
+                    :meth:`Marshaller.parallel`
+    :param cache: a :class:`MarshalCache` to take the records of unchanged
+                  objects from
+    :param columns: the columns of the rows in ``data`` (names, a cursor's
+                    ``description`` or a namedtuple class), to read the
+                    fields off the rows by position, see :func:`bind_fields`
 
     >>> from flask.ext.restful import fields, marshal
     >>> data = { 'a': 100, 'b': 'foo' }
@@ -558,20 +1281,250 @@ def marshal(data, fields, envelope=None):
     OrderedDict([('data', OrderedDict([('a', 100)]))])
 
     """
+    marshaller = compile_fields(fields, envelope, dict_class, memo, loader_pool)
+    if columns is not None:
+        marshaller = marshaller.bind(columns)
+    if cache is not None:
+        return _cached(cache.marshal, marshaller, data)
+    if _profiling_fields():
+        return _profiled(marshaller.profiled(), data)
+    if workers and marshaller.is_list(data):
+        return marshaller.parallel(data, workers)
+    return marshaller(data)
+
+
+def marshal_many(rows, fields, envelope=None, dict_class=None, memo=None, loader_pool=None):
+    """Marshals a list of records column by column: every field pulls its
+    values for all the records, then formats the whole column in one pass.
+    The output is the same as :func:`marshal` on the list, but large lists
+    pay far less per-cell overhead. Numeric fields format NumPy structured
+    arrays with vectorised operations.
+
+    :param rows: the records from which the fields are taken from, or a NumPy
+                 structured array
+    :param fields: a dict of whose keys will make up the final serialized
+                   response output, or a compiled :class:`Marshaller`
+    :param envelope: optional key that will be used to envelop the serialized
+                     response
+    :param dict_class: the type of the marshalled records, see :func:`marshal`
+    :param memo: the sub-object memoization policy, see :func:`marshal`
+    :param loader_pool: the pool running batch loads, see :func:`marshal`
+
+    >>> from flask.ext.restful import fields, marshal_many
+    >>> rows = [{ 'a': 100, 'b': 'foo' }, { 'a': '200', 'b': 'bar' }]
+    >>> marshal_many(rows, { 'a': fields.Integer })
+    [OrderedDict([('a', 100)]), OrderedDict([('a', 200)])]
+
+    """
+    marshaller = compile_fields(fields, envelope, dict_class, memo, loader_pool)
+    if _profiling_fields():
+        return _profiled(marshaller.profiled().many, rows)
+    return marshaller.many(rows)
+
+
+def marshal_iter(data, fields, envelope=None, dict_class=None):
+    """Lazily marshals an iterable of records: a generator is returned, and
+    each record is only fetched and marshalled when the generator gets to it.
+    When returned from a resource, the JSON representation streams the
+    records out as they are marshalled, so large collections never have to be
+    held in memory.
+
+    :param data: an iterable of the objects from which the fields are taken
+    :param fields: a dict of whose keys will make up the final serialized
+                   response output, or a compiled :class:`Marshaller`
+    :param envelope: optional key that will be used to envelop the serialized
+                     response; the generator is then the only value of the
+                     returned dict
+    :param dict_class: the type of the marshalled records, see :func:`marshal`
+
+    >>> from flask.ext.restful import fields, marshal_iter
+    >>> rows = ({ 'a': i, 'b': 'foo' } for i in range(2))
+    >>> list(marshal_iter(rows, { 'a': fields.Raw }))
+    [OrderedDict([('a', 0)]), OrderedDict([('a', 1)])]
+
+    """
+    return compile_fields(fields, envelope, dict_class).iter(data)
+
+
+def _profiling_fields():
+    return has_app_context() and current_app.config.get('RESTFUL_PROFILE_FIELDS', False)
 
-    def make(cls):
-        if isinstance(cls, type):
-            return cls()
-        return cls
 
-    if isinstance(data, (list, tuple)):
-        return (OrderedDict([(envelope, [marshal(d, fields) for d in data])])
-                if envelope else [marshal(d, fields) for d in data])
+def _app_profile(app):
+    profile = app.extensions.get('restful_profile')
+    if profile is None:
+        profile = app.extensions.setdefault('restful_profile', profiling.FieldProfile())
+    return profile
 
-    items = ((k, marshal(data, v) if isinstance(v, dict)
-              else make(v).output(k, data))
-             for k, v in fields.items())
-    return OrderedDict([(envelope, OrderedDict(items))]) if envelope else OrderedDict(items)
+
+def _profiled(method, *args):
+    # Records the field timings of a marshal call, then adds them to the
+    # application's profile in one go
+    profile = profiling.FieldProfile()
+    try:
+        with profiling.recording(profile):
+            return method(*args)
+    finally:
+        _app_profile(current_app).merge(profile)
+
+
+def field_profile(reset=False):
+    """Returns the time spent in each field by the marshal calls of the
+    current application, while its ``RESTFUL_PROFILE_FIELDS`` setting is on.
+    See :ref:`field-profiling`.
+
+    :param bool reset: Whether to start over once the report is taken
+    :return: a dict listing the ``fields`` by path, slowest first, with their
+             number of ``calls`` and cumulative ``seconds``, and the
+             ``counters`` of slow operations such as ``url_for`` calls
+    """
+    return _app_profile(current_app).report(reset)
+
+
+class FieldProfileResource(Resource):
+    """A resource reporting :func:`field_profile` on GET, for debugging. The
+    ``reset`` query parameter starts the profile over. ::
+
+        if app.debug:
+            api.add_resource(FieldProfileResource, '/_debug/fields')
+    """
+
+    def get(self):
+        return field_profile(reset='reset' in request.args)
+
+
+def project_fields(fields, names):
+    """Projects a dict of fields down to the given subset. Sub-fields of
+    nested dicts, :class:`~fields.Nested` and :class:`~fields.List` fields
+    are selected with dotted names; naming a field selects all of it.
+
+    :param fields: a dict of fields, or a compiled :class:`Marshaller`
+    :param names: the names of the fields to keep, e.g. ``['id', 'author.name']``
+    :raises ValueError: if a name does not match any field
+
+    >>> from flask.ext.restful import fields, project_fields
+    >>> mfields = { 'a': fields.Raw, 'b': { 'c': fields.Raw, 'd': fields.Raw } }
+    >>> project_fields(mfields, ['b.c'])
+    OrderedDict([('b', OrderedDict([('c', <class 'flask_restful.fields.Raw'>)]))])
+
+    """
+    return _project(fields, _field_tree(names))
+
+
+def _field_tree(names):
+    # Turns dotted names into a tree of dicts, with None for the fields that
+    # are selected whole
+    tree = {}
+    for name in names:
+        node, parts = tree, name.split('.')
+        for part in parts[:-1]:
+            if part in node and node[part] is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+def _project(fields, tree, prefix=''):
+    if isinstance(fields, Marshaller):
+        fields = fields.fields
+    for key in sorted(tree):
+        if key not in fields:
+            raise ValueError("Unknown field '%s%s'" % (prefix, key))
+    projected = OrderedDict()
+    for key, field in fields.items():
+        if key not in tree:
+            continue
+        if tree[key] is None:
+            projected[key] = field
+        elif isinstance(field, (dict, Marshaller)):
+            projected[key] = _project(field, tree[key], prefix + key + '.')
+        else:
+            projected[key] = _make(field).project(tree[key], prefix + key + '.')
+    return projected
+
+
+def expand_fields(fields, names):
+    """Expands the :class:`~fields.Nested` fields created with
+    ``expand_only=True`` that are named, so that they render their nested
+    fields instead of their reference. Fields inside nested dicts,
+    :class:`~fields.Nested` and :class:`~fields.List` fields are named with
+    dotted names.
+
+    :param fields: a dict of fields, or a compiled :class:`Marshaller`
+    :param names: the names of the fields to expand, e.g. ``['author']``
+    :raises ValueError: if a name does not match any field
+    """
+    return _expand(fields, _field_tree(names))
+
+
+def _expand(fields, tree, prefix=''):
+    if isinstance(fields, Marshaller):
+        fields = fields.fields
+    for key in sorted(tree):
+        if key not in fields:
+            raise ValueError("Unknown field '%s%s'" % (prefix, key))
+    expanded = OrderedDict()
+    for key, field in fields.items():
+        if key not in tree:
+            expanded[key] = field
+        elif isinstance(field, (dict, Marshaller)):
+            expanded[key] = _expand(field, tree[key] or {}, prefix + key + '.')
+        else:
+            expanded[key] = _make(field).expand(tree[key], prefix + key + '.')
+    return expanded
+
+
+def bind_fields(fields, columns):
+    """Binds a dict of fields to the columns of rows such as DB-API rows,
+    :class:`sqlite3.Row` or namedtuples: every field whose key (or attribute)
+    names a column reads the value at that column's position, without
+    looking the key up. Fields of nested dicts read from the same rows.
+    Other fields are left as they are.
+
+    :param fields: a dict of fields, or a compiled :class:`Marshaller`
+    :param columns: the column names in order, a cursor's ``description``,
+                    or a namedtuple class
+    """
+    return _bind(fields, _column_indexes(columns))
+
+
+def _holds_rows(data):
+    # Whether a list or tuple read by column position is a list of rows
+    # rather than one row. Some drivers' fetchall returns a tuple of rows.
+    if isinstance(data, list):
+        return True
+    if hasattr(data, '_fields'):
+        return False
+    return all(hasattr(item, '__getitem__') and not isinstance(item, (six.string_types, bytes))
+               for item in data)
+
+
+def _column_indexes(columns):
+    names = getattr(columns, '_fields', columns)
+    names = [name if isinstance(name, six.string_types) else name[0] for name in names]
+    return dict((name, i) for i, name in reversed(list(enumerate(names))))
+
+
+def _bind(fields, columns):
+    if isinstance(fields, Marshaller):
+        fields = fields.fields
+    bound = OrderedDict()
+    for key, field in fields.items():
+        if isinstance(field, (dict, Marshaller)):
+            bound[key] = _bind(field, columns)
+        else:
+            bound[key] = _make(field).bind(key, columns)
+    return bound
+
+
+def _cpu_count():
+    try:
+        from multiprocessing import cpu_count
+        return cpu_count()
+    except NotImplementedError:
+        return 1
 
 
 class marshal_with(object):
@@ -597,25 +1550,159 @@ class marshal_with(object):
 
     see :meth:`flask.ext.restful.marshal`
     """
-    def __init__(self, fields, envelope=None):
+
+    #: How many projections of the fields are kept compiled for sparse
+    #: fieldsets, per decorated function
+    sparse_cache_size = 128
+
+    def __init__(self, fields, envelope=None, encode=False, dict_class=None, memo=None,
+                 sparse=False, expand='expand', loader_pool=None, parallel=False, cache=None,
+                 columns=None):
         """
         :param fields: a dict of whose keys will make up the final
                        serialized response output
         :param envelope: optional key that will be used to envelop the serialized
                          response
+        :param encode: whether to encode the response straight to JSON bytes
+                       (see :meth:`Marshaller.encode`). Only use it on
+                       resources which are always rendered as JSON.
+        :param dict_class: the type of the marshalled records, see
+                           :func:`marshal`
+        :param memo: the sub-object memoization policy, see :func:`marshal`
+        :param sparse: whether clients may pick the fields to render with a
+                       ``fields`` query parameter, e.g. ``?fields=id,author.name``
+                       (see :func:`project_fields`). Pass a string to use
+                       another parameter name. Unknown fields are answered
+                       with a 400.
+        :param expand: the query parameter naming the expandable
+                       :class:`~fields.Nested` fields to expand, e.g.
+                       ``?expand=author`` (see :func:`expand_fields`), or
+                       None to ignore it. It is only looked at if the fields
+                       have expandable fields.
+        :param loader_pool: the pool running batch loads, see :func:`marshal`
+        :param parallel: whether to marshal large lists in chunks on one
+                         thread per CPU, which only helps fields waiting on
+                         I/O. Pass a number of threads, or a pool (e.g. a
+                         process pool, to use several cores), see
+                         :meth:`Marshaller.parallel`. Ignored with
+                         ``encode``.
+        :param cache: a :class:`MarshalCache` to take the records of
+                      unchanged objects from, item by item
+        :param columns: the columns of the rows the decorated function
+                        returns, to read the fields off them by position, see
+                        :func:`bind_fields`
         """
-        self.fields = fields
+        self.fields = fields if columns is None else bind_fields(fields, columns)
+        self.columns = columns
         self.envelope = envelope
+        self.encode = encode
+        self.dict_class = dict_class
+        self.memo = memo
+        self.sparse = 'fields' if sparse is True else sparse
+        self.expand = expand
+        self.loader_pool = loader_pool
+        self.parallel = parallel
+        self.cache = cache
+        self._expandable = None
+        self._marshaller = None
+        self._projections = LRUCache(self.sparse_cache_size)
+
+    @property
+    def marshaller(self):
+        """The :class:`Marshaller` compiled from the fields on first use"""
+        if self._marshaller is None:
+            self._marshaller = self._compile(self.fields)
+        return self._marshaller
+
+    def request_marshaller(self):
+        """The :class:`Marshaller` for the current request: the one for the
+        fields the client asked for if ``sparse`` is set, with the fields
+        named by the ``expand`` parameter expanded. Falls back to
+        :attr:`marshaller`. Variants are compiled once and cached by the
+        normalized lists of field names."""
+        names = ()
+        if self.sparse and has_request_context():
+            names = self._requested(self.sparse)
+        if self._expandable is None:
+            self._expandable = _any_field(self.fields, _is_expandable, set())
+        expand = ()
+        if self.expand and self._expandable and has_request_context():
+            expand = self._requested(self.expand)
+        if not names and not expand:
+            return self.marshaller
+        key = (names, expand)
+        marshaller = self._projections.get(key)
+        if marshaller is None:
+            fields = self.fields
+            try:
+                if expand:
+                    fields = expand_fields(fields, expand)
+                if names:
+                    fields = project_fields(fields, names)
+            except ValueError as e:
+                abort(400, message=six.text_type(e))
+            marshaller = self._compile(fields)
+            self._projections.set(key, marshaller)
+        return marshaller
+
+    def _compile(self, fields):
+        marshaller = compile_fields(fields, self.envelope, self.dict_class, self.memo,
+                                    self.loader_pool)
+        marshaller._reads_rows = self.columns is not None
+        return marshaller
+
+    @staticmethod
+    def _requested(param):
+        names = set(name.strip() for value in request.args.getlist(param)
+                    for name in value.split(','))
+        names.discard('')
+        return tuple(sorted(names))
+
+    def marshal(self, data):
+        """Marshals the data returned by the decorated function"""
+        marshaller = self.request_marshaller()
+        if self.cache is not None:
+            if self.encode:
+                return RawJSON(_cached(self.cache.encode, marshaller, data))
+            return _cached(self.cache.marshal, marshaller, data)
+        if _profiling_fields():
+            marshaller = marshaller.profiled()
+            if self.encode:
+                return RawJSON(_profiled(marshaller.encode, data))
+            return _profiled(marshaller, data)
+        if self.encode:
+            return RawJSON(marshaller.encode(data))
+        if self.parallel and marshaller.is_list(data):
+            workers = _cpu_count() if self.parallel is True else self.parallel
+            return marshaller.parallel(data, workers)
+        return marshaller(data)
+
+    @staticmethod
+    def _unwrap_row(resp):
+        # Rows are tuples themselves, so a plain tuple is never guessed to be
+        # one: it is (data, code, headers), with a single row as (row,).
+        # An empty tuple holds no rows.
+        if len(resp) < 2:
+            return (resp[0] if resp else resp), 200, {}
+        if len(resp) > 3 or not isinstance(resp[1], six.integer_types):
+            raise TypeError('Resources marshalling columns return tuples as '
+                            '(data, code, headers): return a single row as (row,) '
+                            'or as a namedtuple, not %r' % (resp,))
+        return resp
 
     def __call__(self, f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             resp = f(*args, **kwargs)
+            if self.columns is not None and isinstance(resp, tuple):
+                if hasattr(resp, '_fields'):
+                    return self.marshal(resp)
+                resp = self._unwrap_row(resp)
             if isinstance(resp, tuple):
                 data, code, headers = unpack(resp)
-                return marshal(data, self.fields, self.envelope), code, headers
+                return self.marshal(data), code, headers
             else:
-                return marshal(resp, self.fields, self.envelope)
+                return self.marshal(resp)
         return wrapper
 
 
@@ -641,11 +1728,14 @@ class marshal_with_field(object):
             self.field = field()
         else:
             self.field = field
+        self.pairs = _any_field({None: self.field}, _makes_pairs, set())
 
     def __call__(self, f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             resp = f(*args, **kwargs)
+            if self.pairs:
+                mark_pairs()
 
             if isinstance(resp, tuple):
                 data, code, headers = unpack(resp)
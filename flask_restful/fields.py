@@ -1,5 +1,12 @@
+from copy import copy
+from functools import partial
 from inspect import isfunction
-from decimal import Decimal as MyDecimal, ROUND_HALF_EVEN
+from operator import itemgetter
+import re
+from string import Formatter
+import threading
+import types
+from decimal import Decimal as MyDecimal, ROUND_HALF_EVEN, DefaultContext
 import six
 try:
     from urlparse import urlparse, urlunparse
@@ -7,12 +14,19 @@ except ImportError:
     # python3
     from urllib.parse import urlparse, urlunparse
 
-from flask_restful import inputs, marshal
-from flask import url_for, request
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from flask_restful import inputs, compile_fields, _make, _memo, _project, _expand
+from flask_restful.representations.json import string_encoder, float_json
+from flask_restful.utils import OrderedDict, KeyValuePairs, LRUCache, profiling
+from flask import url_for, request, current_app, _request_ctx_stack
 
 __all__ = ["String", "FormattedString", "Url", "DateTime", "Float",
            "Integer", "Arbitrary", "Nested", "List", "Raw", "Boolean",
-           "Fixed", "Price"]
+           "Fixed", "Price", "Loader"]
 
 
 class MarshallingException(Exception):
@@ -32,20 +46,7 @@ def is_indexable_but_not_string(obj):
 
 def get_value(key, obj, default=None):
     """Helper for pulling a keyed value off various types of objects"""
-    if type(key) == int:
-        return _get_value_for_key(key, obj, default)
-    elif isfunction(key):
-        return key(obj)
-    else:
-        return _get_value_for_keys(key.split('.'), obj, default)
-
-
-def _get_value_for_keys(keys, obj, default):
-    if len(keys) == 1:
-        return _get_value_for_key(keys[0], obj, default)
-    else:
-        return _get_value_for_keys(
-            keys[1:], _get_value_for_key(keys[0], obj, default), default)
+    return get_accessor(key)(obj, default)
 
 
 def _get_value_for_key(key, obj, default):
@@ -57,6 +58,212 @@ def _get_value_for_key(key, obj, default):
     return getattr(obj, key, default)
 
 
+def _get_item(obj, key, default):
+    try:
+        return obj[key]
+    except (IndexError, TypeError, KeyError):
+        return getattr(obj, key, default)
+
+
+def _get_dict_item(obj, key, default):
+    try:
+        return obj[key]
+    except KeyError:
+        return getattr(obj, key, default)
+
+
+def _get_dynamic(obj, key, default):
+    return _get_value_for_key(key, obj, default)
+
+
+def _getter_for_type(cls):
+    """Picks the cheapest way of pulling a key off instances of ``cls``. Types
+    whose instances can answer ``hasattr`` differently from the type itself
+    (classes, proxies, old-style instances) are checked on every access."""
+    if cls in (dict, OrderedDict):
+        return _get_dict_item
+    if (issubclass(cls, type) or hasattr(cls, '__getattr__') or
+            cls is getattr(types, 'InstanceType', None)):
+        return _get_dynamic
+    if hasattr(cls, 'strip') or not hasattr(cls, '__iter__'):
+        return getattr
+    return _get_item
+
+
+class Accessor(object):
+    """Pulls the value for a key off an object, the same way as
+    :func:`get_value`. Dotted keys are split once into a chain of steps, and
+    each step remembers how to read from every type of object it has seen.
+
+    :param key: a key, an attribute name, a dotted path through nested
+        objects (e.g. ``'author.name'``), an index or a function of the object
+    """
+
+    def __init__(self, key):
+        self.key = key
+        if isfunction(key):
+            self.steps = None
+        elif type(key) == int:
+            self.steps = [(key, {})]
+        else:
+            self.steps = [(k, {}) for k in key.split('.')]
+
+    def __call__(self, obj, default=None):
+        if self.steps is None:
+            return self.key(obj)
+        for key, getters in self.steps:
+            cls = type(obj)
+            try:
+                getter = getters[cls]
+            except KeyError:
+                getter = getters[cls] = _getter_for_type(cls)
+            obj = getter(obj, key, default)
+        return obj
+
+    def __getstate__(self):
+        # The getters seen so far are keyed by type, which may not pickle:
+        # they are worked out again on the other side
+        state = self.__dict__.copy()
+        if self.steps is not None:
+            state['steps'] = [(key, {}) for key, _ in self.steps]
+        return state
+
+    def column(self, objs, default=None):
+        """Pulls the value off every object in ``objs``. When ``objs`` is a
+        NumPy structured array holding the key, the array's column is
+        returned as-is.
+
+        :param objs: a sequence of objects, or a NumPy structured array
+        """
+        if (_is_array(objs) and objs.dtype.names and
+                isinstance(self.key, six.string_types) and self.key in objs.dtype.names):
+            return objs[self.key]
+        return [self(obj, default) for obj in objs]
+
+
+class ColumnAccessor(Accessor):
+    """Reads a value off rows (such as DB-API rows, :class:`sqlite3.Row` or
+    namedtuples) by position: the value of the key's column, followed by the
+    rest of a dotted key. See :func:`~flask.ext.restful.bind_fields`.
+
+    :param key: the key of the value
+    :param int index: the position of the key's column in the rows
+    :param rest: the part of a dotted key after the column name, if any
+    """
+
+    def __init__(self, key, index, rest=None):
+        self.key = key
+        self.index = index
+        self.rest = None if rest is None else get_accessor(rest)
+        self.steps = None
+
+    def __call__(self, obj, default=None):
+        value = obj[self.index]
+        if self.rest is None:
+            return value
+        return self.rest(value, default)
+
+    def column(self, objs, default=None):
+        values = list(map(itemgetter(self.index), objs))
+        if self.rest is None:
+            return values
+        return [self.rest(value, default) for value in values]
+
+
+def _is_array(values):
+    return numpy is not None and isinstance(values, numpy.ndarray)
+
+
+def scalar_json(json_type, encoder):
+    """Returns a function encoding values as JSON text with the given
+    :class:`json.JSONEncoder`, with a shortcut for values of ``json_type``
+    (``six.text_type``, ``int``, ``float`` or ``bool``). Values of any other
+    type go through the encoder."""
+    generic = encoder.encode
+    if json_type is six.text_type:
+        quote = string_encoder(encoder)
+        return lambda value: quote(value) if type(value) is six.text_type else generic(value)
+    if json_type is int:
+        return lambda value: int.__repr__(value) if type(value) is int else generic(value)
+    if json_type is float and encoder.allow_nan:
+        return lambda value: float_json(value) if type(value) is float else generic(value)
+    if json_type is bool:
+        return lambda value: (value and 'true' or 'false') if type(value) is bool else generic(value)
+    return generic
+
+
+class Loader(object):
+    """Looks up the values for many keys in one call, for the fields which
+    declare it as their ``loader``. The field pulls a key off every object,
+    e.g. an id, and renders the value the loader looks up for it instead.
+    When a list is marshalled, all the keys of the field are looked up at
+    once, so a backend is queried once per list instead of once per object.
+
+    :param batch: a function taking a list of distinct keys, and returning
+        either a dict mapping them to their values or a list of their values
+        in the same order. Keys without a value render as None.
+
+    >>> authors = Loader(lambda ids: User.query.filter(User.id.in_(ids)).all())
+    >>> fields = {'author': Nested(user_fields, attribute='author_id', loader=authors)}
+    """
+
+    def __init__(self, batch):
+        self.batch = batch
+        self._primed = threading.local()
+
+    def __getstate__(self):
+        return {'batch': self.batch}
+
+    def __setstate__(self, state):
+        self.__init__(state['batch'])
+
+    def fetch(self, keys):
+        """Calls the batch function for the distinct keys of ``keys``, and
+        returns a dict mapping them to their values"""
+        unique = list(OrderedDict.fromkeys(key for key in keys if key is not None))
+        if not unique:
+            return {}
+        values = self.batch(unique)
+        if hasattr(values, 'keys'):
+            return dict(values)
+        return dict(zip(unique, values))
+
+    def prime(self, loaded):
+        """Lets the current thread use the given dict of values already
+        fetched, until :meth:`prime` is called again (e.g. with None)"""
+        self._primed.loaded = loaded
+
+    def load_many(self, keys):
+        """Returns the values for every key, fetching the ones not primed in
+        one call"""
+        loaded = getattr(self._primed, 'loaded', None) or {}
+        missing = [key for key in keys if key is not None and key not in loaded]
+        if missing:
+            loaded = dict(loaded)
+            loaded.update(self.fetch(missing))
+        return [None if key is None else loaded.get(key) for key in keys]
+
+    def load(self, key):
+        """Returns the value for a single key"""
+        return self.load_many([key])[0]
+
+
+# The accessors of the most recently used keys. Only string keys are shared:
+# others, such as the positions List reads items at, would pile up.
+_accessors = LRUCache(1024)
+
+
+def get_accessor(key):
+    """Returns a (shared) :class:`Accessor` for the given key"""
+    if not isinstance(key, six.string_types):
+        return Accessor(key)
+    accessor = _accessors.get(key)
+    if accessor is None:
+        accessor = Accessor(key)
+        _accessors.set(key, accessor)
+    return accessor
+
+
 def to_marshallable_type(obj):
     """Helper for converting an object to a dictionary only if it is not
     dictionary already or an indexable object nor a simple type"""
@@ -79,9 +286,128 @@ class Raw(object):
     throw a MarshallingException in case of parsing problem.
     """
 
-    def __init__(self, default=None, attribute=None):
+    #: The type :meth:`format` returns, used to encode values straight to JSON
+    json_type = None
+
+    # Defaults for fields whose __init__ does not call this one
+    loader = None
+    _attribute = None
+    _accessor = None
+    # The attributes caching what a field worked out while rendering, which
+    # are left out when it is pickled
+    _caches = ()
+
+    def __init__(self, default=None, attribute=None, loader=None):
         self.attribute = attribute
         self.default = default
+        self.loader = loader
+
+    @property
+    def attribute(self):
+        return self._attribute
+
+    @attribute.setter
+    def attribute(self, attribute):
+        self._attribute = attribute
+        self._accessor = None if attribute is None else Accessor(attribute)
+
+    def __getstate__(self):
+        # Runtime caches can hold bound methods, closures or the request's
+        # url adapter: they are rebuilt on first use after unpickling
+        state = self.__dict__.copy()
+        for name in self._caches:
+            state.pop(name, None)
+        return state
+
+    def inherit(self, options):
+        """Returns the field to render with inside a
+        :class:`~flask.ext.restful.Marshaller` compiled with the given
+        options. Fields which marshal nested data return a copy that passes
+        the options on; others are returned as-is.
+
+        :param dict options: The marshaller's options
+        """
+        return self
+
+    def project(self, tree, prefix=''):
+        """Returns a copy of the field that only renders some of its
+        sub-fields, see :func:`~flask.ext.restful.project_fields`. Fields
+        without sub-fields raise a :exc:`ValueError`.
+
+        :param dict tree: The sub-fields to keep, by name. Their values are
+            trees of their own sub-fields to keep, or None to keep them whole.
+        :param str prefix: The path of the field, for error messages
+        """
+        raise ValueError("Field '%s' has no sub-fields" % prefix.rstrip('.'))
+
+    def expand(self, tree, prefix=''):
+        """Returns a copy of the field with its expandable sub-fields
+        expanded, see :func:`~flask.ext.restful.expand_fields`. Fields
+        without sub-fields raise a :exc:`ValueError`.
+
+        :param dict tree: The sub-fields to expand, by name. Their values are
+            trees of their own sub-fields to expand, or None.
+        :param str prefix: The path of the field, for error messages
+        """
+        raise ValueError("Field '%s' can't be expanded" % prefix.rstrip('.'))
+
+    def bind(self, key, columns):
+        """Returns a copy of the field reading its value off rows by position,
+        see :func:`~flask.ext.restful.bind_fields`. Fields whose key (or
+        attribute) is not one of the columns are returned as-is.
+
+        :param key: The key the field is rendered under
+        :param dict columns: The position of each column, by name
+        """
+        name = self.attribute if self.attribute is not None else key
+        if not isinstance(name, six.string_types):
+            return self
+        head, _, rest = name.partition('.')
+        if name in columns:
+            accessor = ColumnAccessor(name, columns[name])
+        elif rest and head in columns:
+            accessor = ColumnAccessor(name, columns[head], rest)
+        else:
+            return self
+        field = copy(self)
+        field._accessor = accessor
+        return field
+
+    def accessor(self, key):
+        """Returns the :class:`Accessor` used to pull this field's value off
+        an object when it is rendered under the given key.
+
+        :param key: The key the field is rendered under
+        """
+        accessor = self._accessor
+        if accessor is None:
+            return get_accessor(key if self.attribute is None else self.attribute)
+        return accessor
+
+    def getter(self, key):
+        """Returns a function pulling this field's value off an object: its
+        :meth:`accessor`, followed by its :class:`Loader` if it has one.
+
+        :param key: The key the field is rendered under
+        """
+        accessor, loader = self.accessor(key), self.loader
+        if loader is None:
+            return accessor
+        return lambda obj: loader.load(accessor(obj))
+
+    def column(self, key, objs):
+        """Pulls this field's value off every object, loading all of them at
+        once if the field has a :class:`Loader`.
+
+        :param key: The key the field is rendered under
+        :param objs: a sequence of objects, or a NumPy structured array
+        """
+        values = self.accessor(key).column(objs)
+        if self.loader is None:
+            return values
+        if _is_array(values):
+            values = values.tolist()
+        return self.loader.load_many(values)
 
     def format(self, value):
         """Formats a field's value. No-op by default - field classes that
@@ -109,13 +435,79 @@ class Raw(object):
         :exception MarshallingException: In case of formatting problem
         """
 
-        value = get_value(key if self.attribute is None else self.attribute, obj)
+        value = self.getter(key)(obj)
 
         if value is None:
             return self.default
 
         return self.format(value)
 
+    def output_function(self, key):
+        """Returns a function that outputs the field for an object, as
+        :meth:`output` does for the given key. The accessor is resolved once,
+        when a :class:`~flask.ext.restful.Marshaller` compiles its plan,
+        instead of for every object.
+
+        :param key: The key the field is rendered under
+        """
+        if six.get_unbound_function(type(self).output) is not _raw_output:
+            return partial(self.output, key)
+
+        accessor, default, format = self.getter(key), self.default, self.format
+
+        def output(obj):
+            value = accessor(obj)
+            return default if value is None else format(value)
+        return output
+
+    def output_many(self, key, objs):
+        """Outputs the field for every object in ``objs`` at once, pulling the
+        whole column of values before formatting it with
+        :meth:`format_column`. Fields that override :meth:`output` are output
+        one object at a time.
+
+        :param key: The key the field is rendered under
+        :param objs: a sequence of objects, or a NumPy structured array
+        """
+        if six.get_unbound_function(type(self).output) is not _raw_output:
+            return [self.output(key, obj) for obj in objs]
+        return self.format_column(self.column(key, objs))
+
+    def json_output(self, key, encoder):
+        """Returns a function that outputs the field for an object straight to
+        JSON text, as the given :class:`json.JSONEncoder` would encode the
+        result of :meth:`output`.
+
+        :param key: The key the field is rendered under
+        :param encoder: The JSON encoder to use for values without a shortcut
+        """
+        encode = scalar_json(self.json_type, encoder)
+        if six.get_unbound_function(type(self).output) is not _raw_output:
+            output = self.output
+            return lambda obj: encode(output(key, obj))
+
+        accessor, default, format = self.getter(key), self.default, self.format
+
+        def output_json(obj):
+            value = accessor(obj)
+            return encode(default if value is None else format(value))
+        return output_json
+
+    def format_column(self, values):
+        """Formats a column of values the way :meth:`output` formats each of
+        them: missing values are replaced by the default. Field classes can
+        override this to format a whole column in one pass.
+
+        :param values: a list of values, or a NumPy array
+        """
+        if _is_array(values):
+            values = values.tolist()
+        default, format = self.default, self.format
+        return [default if value is None else format(value) for value in values]
+
+
+_raw_output = six.get_unbound_function(Raw.output)
+
 
 class Nested(Raw):
     """Allows you to nest one set of fields inside another.
@@ -124,26 +516,204 @@ class Nested(Raw):
     :param dict nested: The dictionary to nest
     :param bool allow_null: Whether to return None instead of a dictionary
         with null keys, if a nested dictionary has all-null keys
+    :param dict_class: The type of the nested records. Defaults to the one
+        of the enclosing marshal call.
+    :param bool expand_only: Whether to only render the nested fields when
+        they are expanded (see :ref:`expandable-fields`), and the reference
+        otherwise. The nested object isn't even looked up then.
+    :param reference: The field rendered in place of the nested fields while
+        they are not expanded, from the enclosing object, e.g.
+        ``fields.Integer(attribute='author_id')`` or a :class:`Url`. Renders
+        None if not set.
     :param kwargs: if ``default`` keyword argument is present, a nested dictionary
         will be marshaled as its value if nested dictionary is all-null keys
         (e.g. lets you return an empty JSON object instead of null)
     :keyword default
     """
-
-    def __init__(self, nested, allow_null=False, **kwargs):
+    _marshaller = None
+    _caches = ('_marshaller',)
+    dict_class = None
+    expand_only = False
+    reference = None
+    # The sub-object memoization policy, loader pool and profiling of the
+    # enclosing marshal call
+    memo = None
+    loader_pool = None
+    profile = False
+
+    def __init__(self, nested, allow_null=False, dict_class=None, expand_only=False,
+                 reference=None, **kwargs):
         self.nested = nested
         self.allow_null = allow_null
+        self.dict_class = dict_class
+        self.expand_only = expand_only
+        self.reference = None if reference is None else _make(reference)
         super(Nested, self).__init__(**kwargs)
 
+    @property
+    def marshaller(self):
+        """The :class:`~flask.ext.restful.Marshaller` compiled from the nested
+        fields on first use"""
+        if self._marshaller is None or self._marshaller.fields is not self.nested:
+            self._marshaller = compile_fields(self.nested, dict_class=self.dict_class,
+                                              memo=self.memo, loader_pool=self.loader_pool,
+                                              profile=self.profile)
+        return self._marshaller
+
+    def inherit(self, options):
+        dict_class = self.dict_class
+        if dict_class is None:
+            dict_class = options.get('dict_class')
+        memo = self.memo or options.get('memo')
+        loader_pool = self.loader_pool or options.get('loader_pool')
+        profile = self.profile or options.get('profile', False)
+        if (dict_class is self.dict_class and memo == self.memo and
+                loader_pool is self.loader_pool and profile == self.profile):
+            return self
+        field = copy(self)
+        field.dict_class = dict_class
+        field.memo = memo
+        field.loader_pool = loader_pool
+        field.profile = profile
+        field._marshaller = None
+        return field
+
+    def bind(self, key, columns):
+        field = super(Nested, self).bind(key, columns)
+        if self.reference is not None:
+            reference = self.reference.bind(key, columns)
+            if reference is not self.reference:
+                field = copy(field) if field is self else field
+                field.reference = reference
+        return field
+
+    def project(self, tree, prefix=''):
+        field = copy(self)
+        field.nested = _project(self.nested, tree, prefix)
+        field._marshaller = None
+        return field
+
+    def expand(self, tree, prefix=''):
+        field = copy(self)
+        field.expand_only = False
+        if tree:
+            field.nested = _expand(self.nested, tree, prefix)
+            field._marshaller = None
+        return field
+
     def output(self, key, obj):
-        value = get_value(key if self.attribute is None else self.attribute, obj)
+        if self.expand_only:
+            return None if self.reference is None else self.reference.output(key, obj)
+        return self._render(self.getter(key)(obj))
+
+    def output_function(self, key):
+        if (six.get_unbound_function(type(self).output) is not _nested_output or
+                self.expand_only):
+            return super(Nested, self).output_function(key)
+        accessor, render = self.getter(key), self._render
+        return lambda obj: render(accessor(obj))
+
+    def output_many(self, key, objs):
+        if self.expand_only:
+            if self.reference is None:
+                return [None] * len(objs)
+            return self.reference.output_many(key, objs)
+        values = self.column(key, objs)
+        if _is_array(values):
+            values = values.tolist()
+        if self.memo and _memo.table is not None:
+            # Marshal the sub-objects not seen yet in one batch, then take
+            # every value from the memo
+            table, schema = _memo.table, (id(self.nested), self.dict_class)
+            fresh = OrderedDict()
+            for value in values:
+                if _is_record(value) and (id(value),) + schema not in table:
+                    fresh[id(value)] = value
+            fresh = list(fresh.values())
+            for value, record in zip(fresh, self.marshaller.marshal_columns(fresh)):
+                table[(id(value),) + schema] = (value, record)
+            return [self._render(value) for value in values]
+        records = [value for value in values if _is_record(value)]
+        rendered = iter(self.marshaller.marshal_columns(records))
+        return [next(rendered) if _is_record(value) else self._render(value)
+                for value in values]
+
+    def json_output(self, key, encoder):
+        if six.get_unbound_function(type(self).output) is not _nested_output:
+            return super(Nested, self).json_output(key, encoder)
+        if self.expand_only:
+            if self.reference is None:
+                return lambda obj: 'null'
+            return self.reference.json_output(key, encoder)
+
+        accessor, allow_null, default = self.getter(key), self.allow_null, self.default
+        nested = self.marshaller.json_encoder(encoder)
+        generic = encoder.encode
+        if self.memo:
+            nested = _memoized_json(nested, id(self.nested))
+
+        def output_json(obj):
+            value = accessor(obj)
+            if value is None:
+                if allow_null:
+                    return 'null'
+                elif default is not None:
+                    return generic(default)
+            return nested(value)
+        return output_json
+
+    def _render(self, value):
         if value is None:
             if self.allow_null:
                 return None
             elif self.default is not None:
                 return self.default
 
-        return marshal(value, self.nested)
+        if self.memo and _memo.table is not None and _is_record(value):
+            return _recall(value, (id(self.nested), self.dict_class), self.marshaller,
+                           self.memo == 'copy')
+
+        return self.marshaller(value)
+
+
+_nested_output = six.get_unbound_function(Nested.output)
+
+
+def _is_record(value):
+    return value is not None and not isinstance(value, (list, tuple))
+
+
+def _recall(value, schema, render, copy_hits=False):
+    # Renders value once per memoizing marshal call. The memo keeps a
+    # reference to value, so that its id can't be reused by another object
+    # while the call runs.
+    key = (id(value),) + schema
+    entry = _memo.table.get(key)
+    if entry is None:
+        entry = _memo.table[key] = (value, render(value))
+    elif copy_hits:
+        return _copy_record(entry[1])
+    return entry[1]
+
+
+def _memoized_json(encode, schema):
+    # Encoded JSON is immutable text, so it is always shared
+    def memoized(value):
+        if _memo.table is None or not _is_record(value):
+            return encode(value)
+        return _recall(value, (schema, 'json'), encode)
+    return memoized
+
+
+def _copy_record(value):
+    # Copies the containers of a marshalled record, sharing the leaf values
+    if isinstance(value, dict):
+        return type(value)((k, _copy_record(v)) for k, v in value.items())
+    if type(value) is KeyValuePairs:
+        return KeyValuePairs((k, _copy_record(v)) for k, v in value)
+    if isinstance(value, list):
+        return [_copy_record(v) for v in value]
+    return value
 
 
 class List(Raw):
@@ -155,6 +725,10 @@ class List(Raw):
     :param cls_or_instance: The field type the list will contain.
     """
 
+    # The container the items formatter was worked out for, and the formatter
+    _items = (None, None)
+    _caches = ('_items',)
+
     def __init__(self, cls_or_instance, **kwargs):
         super(List, self).__init__(**kwargs)
         error_msg = ("The type of the list elements must be a subclass of "
@@ -168,11 +742,55 @@ class List(Raw):
                 raise MarshallingException(error_msg)
             self.container = cls_or_instance
 
+    def inherit(self, options):
+        container = self.container.inherit(options)
+        if container is self.container:
+            return self
+        field = copy(self)
+        field.container = container
+        return field
+
+    def project(self, tree, prefix=''):
+        field = copy(self)
+        field.container = self.container.project(tree, prefix)
+        return field
+
+    def expand(self, tree, prefix=''):
+        field = copy(self)
+        field.container = self.container.expand(tree, prefix)
+        return field
+
     def format(self, value):
         # Convert all instances in typed list to container type
         if isinstance(value, set):
             value = list(value)
-
+        return self._items_formatter()(value)
+
+    def _items_formatter(self):
+        # Works out once how the items are formatted. Containers which output
+        # an item the usual way format the items directly; the others get
+        # each item by its index.
+        container = self.container
+        cached, format_items = self._items
+        if cached is container:
+            return format_items
+        format_items = self._format_by_index
+        if container.attribute is None and container.loader is None:
+            output = six.get_unbound_function(type(container).output)
+            if output is _raw_output and type(container) is Raw:
+                format_items = container.format_column
+            elif output is _raw_output:
+                format_items = partial(_unless_dicts, container.format_column,
+                                       self._format_by_index)
+            elif output is _nested_output and not container.expand_only:
+                format_items = partial(_format_records, container)
+            elif output is _list_output:
+                format_items = partial(_unless_dicts, partial(_render_lists, container),
+                                       self._format_by_index)
+        self._items = (container, format_items)
+        return format_items
+
+    def _format_by_index(self, value):
         return [
             self.container.output(idx,
                                   val if isinstance(val, dict) and
@@ -183,7 +801,23 @@ class List(Raw):
         ]
 
     def output(self, key, data):
-        value = get_value(key if self.attribute is None else self.attribute, data)
+        return self._render(self.getter(key)(data))
+
+    def output_function(self, key):
+        if six.get_unbound_function(type(self).output) is not _list_output:
+            return super(List, self).output_function(key)
+        accessor, render = self.getter(key), self._render
+        return lambda obj: render(accessor(obj))
+
+    def output_many(self, key, objs):
+        if six.get_unbound_function(type(self).output) is not _list_output:
+            return super(List, self).output_many(key, objs)
+        values = self.column(key, objs)
+        if _is_array(values):
+            values = values.tolist()
+        return _render_lists(self, values)
+
+    def _render(self, value):
         # we cannot really test for external dict behavior
         if is_indexable_but_not_string(value) and not isinstance(value, dict):
             return self.format(value)
@@ -191,7 +825,80 @@ class List(Raw):
         if value is None:
             return self.default
 
-        return [marshal(value, self.container.nested)]
+        return [self.container.marshaller(value)]
+
+
+_list_output = six.get_unbound_function(List.output)
+
+
+def _unless_dicts(format_items, format_by_index, value):
+    # Containers other than Raw and Nested look up dict items by index
+    for item in value:
+        if isinstance(item, dict):
+            return format_by_index(value)
+    return format_items(value)
+
+
+def _format_records(container, value):
+    # Lists of records go straight to the nested marshaller. Anything else,
+    # and memoized sub-objects, are rendered one by one.
+    if not container.memo:
+        rows = value if type(value) is list else list(value)
+        if all(_is_record(row) for row in rows):
+            marshaller = container.marshaller
+            if marshaller.batched:
+                return marshaller.marshal_columns(rows)
+            marshal_one = marshaller.marshal_one
+            return [marshal_one(row) for row in rows]
+    return _render_items(container, value)
+
+
+def _render_items(container, value):
+    render = container._render
+    return [render(item) for item in value]
+
+
+def _all_records(items):
+    return all(_is_record(item) for item in items)
+
+
+def _no_dicts(items):
+    return not any(isinstance(item, dict) for item in items)
+
+
+def _items_renderer(container):
+    # A function rendering the items of many lists in one call, and the test
+    # a list must pass to be rendered with it, when the container has loaders
+    # below it: rendering the items of a whole column together lets each
+    # loader look up the keys of every list at once.
+    if container.attribute is not None or container.loader is not None:
+        return None, None
+    output = six.get_unbound_function(type(container).output)
+    if (output is _nested_output and not container.expand_only and not container.memo and
+            container.marshaller.batched):
+        return container.marshaller.marshal_columns, _all_records
+    if output is _list_output and _items_renderer(container.container)[0] is not None:
+        return partial(_render_lists, container), _no_dicts
+    return None, None
+
+
+def _render_lists(field, values):
+    # Renders a column of values of a List field, as field._render renders
+    # each of them
+    render_items, renderable = _items_renderer(field.container)
+    if render_items is None:
+        return [field._render(value) for value in values]
+    items, spans = [], []
+    for value in values:
+        if (is_indexable_but_not_string(value) and not isinstance(value, dict) and
+                renderable(value)):
+            spans.append((len(items), len(items) + len(value)))
+            items.extend(value)
+        else:
+            spans.append(None)
+    rendered = render_items(items)
+    return [field._render(value) if span is None else rendered[span[0]:span[1]]
+            for value, span in zip(values, spans)]
 
 
 class String(Raw):
@@ -200,6 +907,8 @@ class String(Raw):
     be converted to :py:class:`unicode` in python2 and :py:class:`str` in
     python3.
     """
+    json_type = six.text_type
+
     def format(self, value):
         try:
             return six.text_type(value)
@@ -217,6 +926,8 @@ class Integer(Raw):
         value, use this to retrieve a different attribute from the response
         than the publicly named value.
     """
+    json_type = int
+
     def __init__(self, default=0, **kwargs):
         super(Integer, self).__init__(default=default, **kwargs)
 
@@ -228,6 +939,14 @@ class Integer(Raw):
         except ValueError as ve:
             raise MarshallingException(ve)
 
+    def format_column(self, values):
+        if _is_array(values):
+            if values.dtype.kind in 'iu':
+                return values.tolist()
+            if values.dtype.kind == 'b':
+                return values.astype(int).tolist()
+        return super(Integer, self).format_column(values)
+
 
 class Boolean(Raw):
     """
@@ -236,6 +955,8 @@ class Boolean(Raw):
     Empty collections such as ``""``, ``{}``, ``[]``, etc. will be converted to
     ``False``.
     """
+    json_type = bool
+
     def format(self, value):
         return bool(value)
 
@@ -257,6 +978,10 @@ class FormattedString(Raw):
         }
         marshal(data, fields)
     """
+    json_type = six.text_type
+
+    names = None
+
     def __init__(self, src_str):
         """
         :param string src_str: the string to format with the other
@@ -264,19 +989,82 @@ class FormattedString(Raw):
         """
         super(FormattedString, self).__init__()
         self.src_str = six.text_type(src_str)
+        names = _format_names(self.src_str)
+        # Positional fields are formatted from the whole object, as before
+        if names is None or any(not name or name.isdigit() for name in names):
+            self.names = None
+        else:
+            self.names = [(name, get_accessor(name)) for name in names]
 
     def output(self, key, obj):
+        if self.names is None:
+            try:
+                data = to_marshallable_type(obj)
+                return self.src_str.format(**data)
+            except (TypeError, IndexError) as error:
+                raise MarshallingException(error)
+
+        # Only the referenced values are pulled off the object
+        if obj is None:
+            raise MarshallingException(TypeError("cannot format %r with None" % self.src_str))
+        if not hasattr(obj, '__getitem__') and hasattr(obj, '__marshallable__'):
+            obj = obj.__marshallable__()
+        values = {}
+        if hasattr(obj, '__getitem__'):
+            if not hasattr(obj, 'keys'):
+                raise MarshallingException(TypeError("%s is not a mapping" % type(obj).__name__))
+            for name, _ in self.names:
+                values[name] = obj[name]
+        else:
+            for name, accessor in self.names:
+                value = accessor(obj, _missing)
+                if value is _missing:
+                    raise KeyError(name)
+                values[name] = value
         try:
-            data = to_marshallable_type(obj)
-            return self.src_str.format(**data)
+            return self.src_str.format(**values)
         except (TypeError, IndexError) as error:
             raise MarshallingException(error)
 
 
+_missing = object()
+
+_first_name = re.compile(r'[^.[]*')
+
+
+def _format_names(format_string):
+    """Returns the set of the top-level names referenced by the replacement
+    fields of a format string (``'a'`` for ``'{a.b[0]}'``), including the
+    fields nested in format specs, or None if it can't be parsed"""
+    names = set()
+    try:
+        for _, field_name, format_spec, _ in Formatter().parse(format_string):
+            if field_name is not None:
+                names.add(_first_name.match(field_name).group())
+            if format_spec:
+                nested = _format_names(format_spec)
+                if nested is None:
+                    return None
+                names.update(nested)
+    except ValueError:
+        return None
+    return names
+
+
 class Url(Raw):
     """
     A string representation of a Url
+
+    Within a request, the rules of the endpoint are looked up once, and each
+    url is built straight from the rule's variables. Endpoints with url
+    defaults functions or relative (``'.'``-prefixed) names go through
+    :func:`flask.url_for` instead.
     """
+    json_type = six.text_type
+
+    _plan = (None, None, None)
+    _caches = ('_plan',)
+
     def __init__(self, endpoint=None, absolute=False, scheme=None):
         super(Url, self).__init__()
         self.endpoint = endpoint
@@ -285,8 +1073,14 @@ class Url(Raw):
 
     def output(self, key, obj):
         try:
-            data = to_marshallable_type(obj)
+            data = _url_values(obj)
             endpoint = self.endpoint if self.endpoint is not None else request.endpoint
+            if profiling.active:
+                profiling.count('url_for')
+            build = self._builder(endpoint)
+            url = build(data) if build is not None else None
+            if url is not None:
+                return url
             o = urlparse(url_for(endpoint, _external=self.absolute, **data))
             if self.absolute:
                 scheme = self.scheme if self.scheme is not None else o.scheme
@@ -295,12 +1089,88 @@ class Url(Raw):
         except TypeError as te:
             raise MarshallingException(te)
 
+    def _builder(self, endpoint):
+        # The url builder is compiled once per request: it depends on the url
+        # adapter, which holds the script name, host and scheme of the request
+        ctx = _request_ctx_stack.top
+        if ctx is None:
+            return None
+        adapter, cached_endpoint, build = self._plan
+        if adapter is not ctx.url_adapter or cached_endpoint != endpoint:
+            build = self._compile(ctx, endpoint)
+            self._plan = (ctx.url_adapter, endpoint, build)
+        return build
+
+    def _compile(self, ctx, endpoint):
+        app, adapter = current_app, ctx.url_adapter
+        defaults = app.url_default_functions
+        if (adapter is None or not endpoint or endpoint[:1] == '.' or
+                getattr(ctx.request, '_is_old_module', False) or
+                defaults.get(None) or ('.' in endpoint and defaults.get(endpoint.rsplit('.', 1)[0]))):
+            return None
+        adapter.map.update()
+        try:
+            rules = list(adapter.map.iter_rules(endpoint))
+        except KeyError:
+            return None
+
+        # Try the rules in the order MapAdapter.build does: the ones accepting
+        # the default method first
+        method = adapter.default_method
+        rules = [rule for rule in rules if rule.methods is None or method in rule.methods] + rules
+        names = set()
+        for rule in rules:
+            names.update(rule.arguments)
+        names = list(names)
+
+        script_name = adapter.script_name
+        if self.absolute:
+            scheme = self.scheme if self.scheme is not None else adapter.url_scheme
+            prefix = (scheme + ':' if scheme else '') + '//'
+            hosts = {}
+
+        def build(data):
+            if not isinstance(data, dict):
+                data = dict(data)
+            values = {}
+            for name in names:
+                value = data.get(name)
+                if value is not None:
+                    values[name] = value
+            for rule in rules:
+                if rule.suitable_for(values):
+                    rv = rule.build(values, append_unknown=False)
+                    if rv is not None:
+                        break
+            else:
+                return None
+            domain_part, path = rv
+            if not self.absolute:
+                return script_name + path.lstrip('/')
+            host = hosts.get(domain_part)
+            if host is None:
+                host = hosts[domain_part] = adapter.get_host(domain_part)
+            return prefix + host + script_name + path.lstrip('/')
+        return build
+
+
+def _url_values(obj):
+    # The mapping of the values for the url variables, as the original code
+    # would have passed it to url_for, but without copying the __dict__
+    data = obj
+    if obj is not None and not hasattr(obj, '__getitem__'):
+        data = obj.__marshallable__() if hasattr(obj, '__marshallable__') else obj.__dict__
+    if not hasattr(data, 'keys'):
+        raise TypeError("url values must be a mapping, not %s" % type(data).__name__)
+    return data
+
 
 class Float(Raw):
     """
     A double as IEEE-754 double precision.
     ex : 3.141592653589793 3.1415926535897933e-06 3.141592653589793e+24 nan inf -inf
     """
+    json_type = float
 
     def format(self, value):
         try:
@@ -308,57 +1178,170 @@ class Float(Raw):
         except ValueError as ve:
             raise MarshallingException(ve)
 
+    def format_column(self, values):
+        if _is_array(values) and values.dtype.kind in 'biuf':
+            return values.astype(float).tolist()
+        return super(Float, self).format_column(values)
+
 
 class Arbitrary(Raw):
     """
         A floating point number with an arbitrary precision
           ex: 634271127864378216478362784632784678324.23432
     """
+    json_type = six.text_type
 
     def format(self, value):
+        # ints print the same as the Decimal they convert to
+        if type(value) in six.integer_types:
+            return six.text_type(value)
+        if profiling.active:
+            profiling.count('Decimal')
         return six.text_type(MyDecimal(value))
 
+    def format_column(self, values):
+        if _is_array(values) and values.dtype.kind in 'iu':
+            return [six.text_type(value) for value in values.tolist()]
+        return super(Arbitrary, self).format_column(values)
+
 
 class DateTime(Raw):
     """
     Return a formatted datetime string in UTC. Supported formats are RFC 822
     and ISO 8601.
 
+    The field remembers the last second it formatted, so runs of timestamps
+    falling in the same second are only formatted once. Columns of datetimes
+    and NumPy ``datetime64`` arrays format each distinct second once.
+
     :param: str dt_format: rfc822 or iso8601
     """
+    json_type = six.text_type
+
+    _last = (None, None)
+    _caches = ('_last',)
+
     def __init__(self, dt_format='rfc822', **kwargs):
         super(DateTime, self).__init__(**kwargs)
         self.dt_format = dt_format
 
+    def _formatter(self):
+        try:
+            return _datetime_formatters[self.dt_format]
+        except KeyError:
+            raise MarshallingException(
+                'Unsupported date format %s' % self.dt_format
+            )
+
     def format(self, value):
+        formatter = self._formatter()
         try:
-            if self.dt_format == 'rfc822':
-                return inputs.rfc822(value)
-            elif self.dt_format == 'iso8601':
-                return inputs.iso8601(value)
-            else:
-                raise MarshallingException(
-                    'Unsupported date format %s' % self.dt_format
-                )
+            seconds = inputs.timestamp(value)
+        except AttributeError as ae:
+            raise MarshallingException(ae)
+        last, text = self._last
+        if seconds != last:
+            text = formatter(seconds)
+            self._last = (seconds, text)
+        return text
+
+    def format_column(self, values):
+        formatter, default, texts = self._formatter(), self.default, {}
+        if _is_array(values) and values.dtype.kind == 'M':
+            # Each distinct second is formatted once, NaT is missing
+            missing = numpy.isnat(values).tolist()
+            seconds, inverse = numpy.unique(values.astype('datetime64[s]').astype('int64'),
+                                            return_inverse=True)
+            seconds = seconds.tolist()
+            return [default if absent else _formatted(texts, formatter, seconds[i])
+                    for i, absent in zip(inverse.tolist(), missing)]
+        if _is_array(values):
+            values = values.tolist()
+        try:
+            return [default if value is None else _formatted(texts, formatter, inputs.timestamp(value))
+                    for value in values]
         except AttributeError as ae:
             raise MarshallingException(ae)
 
+
+_datetime_formatters = {
+    'rfc822': inputs.rfc822_from_timestamp,
+    'iso8601': inputs.iso8601_from_timestamp,
+}
+
+
+def _formatted(texts, formatter, seconds):
+    try:
+        return texts[seconds]
+    except KeyError:
+        text = texts[seconds] = formatter(seconds)
+        return text
+
 ZERO = MyDecimal()
 
 
 class Fixed(Raw):
     """
     A decimal number with a fixed precision.
+
+    Ints and floats are formatted without going through :class:`Decimal`
+    when the result is known to be the same: up to 6 decimal places, and
+    within the 28 digits of precision of the field's decimal context.
     """
+    json_type = six.text_type
+
+    #: The decimal context values are checked and rounded in
+    context = DefaultContext.copy()
+    context.rounding = ROUND_HALF_EVEN
+
+    _int_format = _float_format = None
+
     def __init__(self, decimals=5, **kwargs):
         super(Fixed, self).__init__(**kwargs)
         self.precision = MyDecimal('0.' + '0' * (decimals - 1) + '1')
+        places = -self.precision.as_tuple().exponent
+        # With more places, str(Decimal) can switch to exponent notation
+        if places <= 6:
+            self._int_format = u'%d.' + u'0' * places
+            self._float_format = u'%%.%df' % places
+            self._int_limit = 10 ** (self.context.prec - places)
+            # A float could round up to one more digit
+            self._float_limit = float(10 ** (self.context.prec - places - 1))
 
     def format(self, value):
+        cls = type(value)
+        if cls in six.integer_types and self._int_format is not None:
+            if -self._int_limit < value < self._int_limit:
+                return self._int_format % value
+        elif cls is float and self._float_format is not None:
+            if value != value or value in (_INFINITY, -_INFINITY):
+                raise MarshallingException('Invalid Fixed precision number.')
+            if -self._float_limit < value < self._float_limit:
+                # %f rounds the exact binary value half-even, like quantize
+                return self._float_format % value
+
+        if profiling.active:
+            profiling.count('Decimal')
         dvalue = MyDecimal(value)
-        if not dvalue.is_normal() and dvalue != ZERO:
+        if not dvalue.is_normal(self.context) and dvalue != ZERO:
             raise MarshallingException('Invalid Fixed precision number.')
-        return six.text_type(dvalue.quantize(self.precision, rounding=ROUND_HALF_EVEN))
+        return six.text_type(dvalue.quantize(self.precision, context=self.context))
+
+    def format_column(self, values):
+        if _is_array(values) and self._int_format is not None:
+            kind = values.dtype.kind
+            # 64 bit integers have at most 20 digits, below the int limit
+            if kind in 'iu':
+                int_format = self._int_format
+                return [int_format % value for value in values.tolist()]
+            if (kind == 'f' and len(values) and numpy.isfinite(values).all() and
+                    numpy.abs(values).max() < self._float_limit):
+                float_format = self._float_format
+                return [float_format % value for value in values.astype(float).tolist()]
+        return super(Fixed, self).format_column(values)
+
+
+_INFINITY = float('inf')
 
 
 """Alias for :py:class:`~fields.Fixed`"""
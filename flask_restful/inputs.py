@@ -1,6 +1,6 @@
 from calendar import timegm
 from datetime import datetime, time, timedelta
-from email.utils import formatdate, parsedate_tz, mktime_tz
+from email.utils import parsedate_tz, mktime_tz
 import re
 
 import aniso8601
@@ -254,7 +254,7 @@ def rfc822(dt):
     :type dt: datetime
     :return: A RFC 822 formatted date string
     """
-    return formatdate(timegm(dt.utctimetuple()))
+    return rfc822_from_timestamp(timestamp(dt))
 
 
 def iso8601(dt):
@@ -268,9 +268,56 @@ def iso8601(dt):
     :type dt: datetime
     :return: A ISO 8601 formatted date string
     """
-    return datetime.isoformat(
-        datetime.fromtimestamp(timegm(dt.utctimetuple()), tz=pytz.UTC)
-    )
+    return iso8601_from_timestamp(timestamp(dt))
+
+
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+_WEEKDAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+_MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+           'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def timestamp(dt):
+    """Returns the whole seconds since the epoch of a datetime, in UTC.
+    Naive datetimes are assumed to be in UTC.
+
+    :param dt: The datetime, or any object with a ``utctimetuple`` method
+    :return: The same as ``calendar.timegm(dt.utctimetuple())``
+    """
+    if not isinstance(dt, datetime):
+        return timegm(dt.utctimetuple())
+    seconds = ((dt.toordinal() - _EPOCH_ORDINAL) * 86400 +
+               dt.hour * 3600 + dt.minute * 60 + dt.second)
+    offset = dt.utcoffset()
+    if offset:
+        seconds -= offset.days * 86400 + offset.seconds
+        if offset.microseconds > dt.microsecond:
+            seconds -= 1
+    return seconds
+
+
+def _split_timestamp(seconds):
+    days, seconds = divmod(seconds, 86400)
+    day = datetime.fromordinal(days + _EPOCH_ORDINAL)
+    hour, seconds = divmod(seconds, 3600)
+    minute, second = divmod(seconds, 60)
+    return day, hour, minute, second
+
+
+def rfc822_from_timestamp(seconds):
+    """Formats seconds since the epoch as an RFC 822 date in UTC, like
+    ``email.utils.formatdate``"""
+    day, hour, minute, second = _split_timestamp(seconds)
+    return '%s, %02d %s %04d %02d:%02d:%02d -0000' % (
+        _WEEKDAYS[day.weekday()], day.day, _MONTHS[day.month - 1], day.year,
+        hour, minute, second)
+
+
+def iso8601_from_timestamp(seconds):
+    """Formats seconds since the epoch as an ISO 8601 date in UTC"""
+    day, hour, minute, second = _split_timestamp(seconds)
+    return '%04d-%02d-%02dT%02d:%02d:%02d+00:00' % (
+        day.year, day.month, day.day, hour, minute, second)
 
 
 def datetime_from_rfc822(datetime_str):
@@ -1,15 +1,148 @@
 from __future__ import absolute_import
-from flask import make_response, current_app
-from json import dumps
+from flask import make_response, current_app, _request_ctx_stack
+from json import dumps, JSONEncoder
+from json.encoder import encode_basestring, encode_basestring_ascii
+import six
+
+from flask_restful.utils import KeyValuePairs, OrderedDict
+
+try:
+    from flask import stream_with_context
+except ImportError:
+    # Flask < 0.9 can't keep the request context while streaming
+    stream_with_context = None
 
 
 # This dictionary contains any kwargs that are to be passed to the json.dumps
 # function, used below.
 settings = {}
 
+# Streamed responses are written out in chunks of roughly this many characters
+STREAM_CHUNK_SIZE = 8192
+
+
+class RawJSON(object):
+    """A response body that has already been encoded to JSON bytes, e.g. by
+    :meth:`~flask.ext.restful.Marshaller.encode`. :func:`output_json` sends it
+    as-is.
+
+    :param data: The encoded JSON
+    :type data: bytes
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+
+_encoder = (None, None)
+
+
+def json_encoder(options=None):
+    """Returns a :class:`json.JSONEncoder` built from :data:`settings`, for
+    encoders that write JSON directly. Indentation is not supported and left
+    out. The encoder is shared until the settings change.
+
+    :param dict options: The settings to use instead of :data:`settings`
+    """
+    global _encoder
+    kwargs = dict(settings if options is None else options)
+    kwargs.pop('indent', None)
+    cached_kwargs, encoder = _encoder
+    if encoder is None or cached_kwargs != kwargs:
+        cls = kwargs.get('cls') or JSONEncoder
+        encoder = cls(**dict((k, v) for k, v in kwargs.items() if k != 'cls'))
+        _encoder = (kwargs, encoder)
+    return encoder
+
+
+def string_encoder(encoder):
+    """Returns the function quoting strings the way the given
+    :class:`json.JSONEncoder` does"""
+    return encode_basestring_ascii if encoder.ensure_ascii else encode_basestring
+
+
+_INFINITY = float('inf')
+
+
+def float_json(value):
+    """Encodes a float the way :func:`json.dumps` does by default"""
+    if value != value:
+        return 'NaN'
+    if value == _INFINITY:
+        return 'Infinity'
+    if value == -_INFINITY:
+        return '-Infinity'
+    return float.__repr__(value)
+
+
+def mark_pairs():
+    """Tells :func:`output_json` that the response of the current request
+    holds :class:`~flask.ext.restful.utils.KeyValuePairs` records, so that it
+    encodes them as objects. Marshalling records of that type calls it; call
+    it when returning such records built by hand below the top level."""
+    ctx = _request_ctx_stack.top
+    if ctx is not None:
+        ctx.restful_pairs = True
+
+
+def _holds_pairs(data):
+    # Looks at the top level and the mark only, without walking the data
+    return (type(data) is KeyValuePairs or
+            getattr(_request_ctx_stack.top, 'restful_pairs', False))
+
+
+def pairs_to_dicts(data):
+    """Returns the data with its :class:`~flask.ext.restful.utils.KeyValuePairs`
+    records turned into ordered dicts, for encoders that cannot write them"""
+    if type(data) is KeyValuePairs:
+        return OrderedDict((key, pairs_to_dicts(value)) for key, value in data)
+    if isinstance(data, dict):
+        cls = OrderedDict if isinstance(data, OrderedDict) else dict
+        return cls((key, pairs_to_dicts(value)) for key, value in data.items())
+    if isinstance(data, (list, tuple)):
+        return [pairs_to_dicts(value) for value in data]
+    return data
+
+
+def encode_json(data, encoder):
+    """Encodes data as JSON text with the given :class:`json.JSONEncoder`,
+    encoding :class:`~flask.ext.restful.utils.KeyValuePairs` as objects"""
+    quote = string_encoder(encoder)
+    key_separator, item_separator = encoder.key_separator, encoder.item_separator
+    encode_other = encoder.encode
+    allow_nan = encoder.allow_nan
+
+    def encode(value):
+        cls = type(value)
+        if cls is six.text_type:
+            return quote(value)
+        if cls is KeyValuePairs:
+            if encoder.sort_keys:
+                value = sorted(value)
+            return '{' + item_separator.join([quote(six.text_type(k)) + key_separator + encode(v)
+                                              for k, v in value]) + '}'
+        if cls is list or cls is tuple:
+            return '[' + item_separator.join([encode(v) for v in value]) + ']'
+        if isinstance(value, dict):
+            items = sorted(value.items()) if encoder.sort_keys else value.items()
+            return '{' + item_separator.join([quote(six.text_type(k)) + key_separator + encode(v)
+                                              for k, v in items]) + '}'
+        if value is None:
+            return 'null'
+        if cls is bool:
+            return 'true' if value else 'false'
+        if cls is int:
+            return int.__repr__(value)
+        if cls is float and allow_nan:
+            return float_json(value)
+        return encode_other(value)
+    return encode(data)
+
 
 def output_json(data, code, headers=None):
-    """Makes a Flask response with a JSON encoded body"""
+    """Makes a Flask response with a JSON encoded body. Iterators (such as the
+    ones returned by :func:`~flask.ext.restful.marshal_iter`) are encoded
+    incrementally, in a streamed response."""
 
     # If we're in debug mode, and the indent is not set, we set it to a
     # reasonable value here.  Note that this won't override any existing value
@@ -19,6 +152,30 @@ def output_json(data, code, headers=None):
         local_settings.setdefault('indent', 4)
         local_settings.setdefault('sort_keys', True)
 
+    if isinstance(data, RawJSON):
+        resp = make_response(data.data, code)
+        resp.headers.extend(headers or {})
+        return resp
+
+    if is_stream(data):
+        if stream_with_context is None:
+            # Encode the whole stream while the request context is around
+            resp = make_response(''.join(iter_json(data, **local_settings)), code)
+        else:
+            resp = current_app.response_class(
+                stream_with_context(iter_json(data, **local_settings)), status=code)
+        resp.headers.extend(headers or {})
+        return resp
+
+    if _holds_pairs(data):
+        if 'indent' in local_settings:
+            dumped = dumps(pairs_to_dicts(data), **local_settings) + '\n'
+        else:
+            dumped = encode_json(data, json_encoder(local_settings))
+        resp = make_response(dumped, code)
+        resp.headers.extend(headers or {})
+        return resp
+
     # We also add a trailing newline to the dumped JSON if the indent value is
     # set - this makes using `curl` on the command line much nicer.
     dumped = dumps(data, **local_settings)
@@ -28,3 +185,67 @@ def output_json(data, code, headers=None):
     resp = make_response(dumped, code)
     resp.headers.extend(headers or {})
     return resp
+
+
+def _is_iterator(data):
+    return hasattr(data, '__next__') or hasattr(data, 'next')
+
+
+def is_stream(data):
+    """Whether the data (or one of the values of an enveloping dict) is an
+    iterator that has to be encoded as a streamed JSON array"""
+    if isinstance(data, dict):
+        return any(_is_iterator(value) for value in data.values())
+    return _is_iterator(data)
+
+
+def iter_json(data, **kwargs):
+    """Encodes data as JSON, yielding the output in chunks. Iterators are
+    encoded as arrays one item at a time, so the whole array never has to be
+    held in memory. Items are encoded without indentation.
+
+    :param data: The data to encode
+    :param kwargs: The keyword arguments :func:`json.dumps` would take
+    """
+    indent = kwargs.pop('indent', None)
+    cls = kwargs.pop('cls', None) or JSONEncoder
+    encoder = cls(**kwargs)
+
+    chunk, size = [], 0
+    for part in _iterencode(data, encoder, _holds_pairs(None)):
+        chunk.append(part)
+        size += len(part)
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk, size = [], 0
+    if indent is not None:
+        chunk.append('\n')
+    if chunk:
+        yield ''.join(chunk)
+
+
+def _iterencode(data, encoder, pairs):
+    if isinstance(data, dict) and is_stream(data):
+        items = data.items()
+        if encoder.sort_keys:
+            items = sorted(items)
+        yield '{'
+        for i, (key, value) in enumerate(items):
+            if i:
+                yield encoder.item_separator
+            yield encoder.encode(six.text_type(key)) + encoder.key_separator
+            for part in _iterencode(value, encoder, pairs):
+                yield part
+        yield '}'
+    elif _is_iterator(data):
+        yield '['
+        for i, item in enumerate(data):
+            if i:
+                yield encoder.item_separator
+            if pairs or type(item) is KeyValuePairs:
+                yield encode_json(item, encoder)
+            else:
+                yield encoder.encode(item)
+        yield ']'
+    else:
+        yield encoder.encode(data)
@@ -1,4 +1,5 @@
 from copy import deepcopy
+from functools import partial
 from flask import request
 from werkzeug.datastructures import MultiDict, FileStorage
 from werkzeug import exceptions
@@ -30,6 +31,83 @@ _friendly_location = {
 
 text_type = lambda x: six.text_type(x)
 
+_getargspec = getattr(inspect, 'getfullargspec', None) or inspect.getargspec
+
+
+def _positional(converter):
+    # The names of the positional parameters of a converter, and whether it
+    # takes *args, or None when its signature cannot be inspected
+    if isinstance(converter, partial):
+        signature = _positional(converter.func)
+        if signature is None:
+            return None
+        names, varargs = signature
+        names = names[len(converter.args):]
+        for i, name in enumerate(names):
+            if name in (converter.keywords or {}):
+                return names[:i], False
+        return names, varargs
+
+    skip = 1
+    if inspect.isclass(converter):
+        function = getattr(converter.__init__, '__func__', converter.__init__)
+        if not inspect.isfunction(function):
+            # No __init__ written in Python: the arguments go to __new__
+            function = converter.__new__
+    elif inspect.isfunction(converter):
+        function, skip = converter, 0
+    elif inspect.ismethod(converter):
+        function = converter
+        if converter.__self__ is None:
+            skip = 0
+    else:
+        function = getattr(type(converter), '__call__', None)
+    function = getattr(function, '__func__', function)
+    if not inspect.isfunction(function):
+        # Classes implemented in C (int, str, ...) take the value alone
+        return ([None], False) if inspect.isclass(converter) else None
+    spec = _getargspec(function)
+    return spec.args[skip:], spec.varargs is not None
+
+
+def _arity(converter):
+    # How many of the value, the argument name and the operator a converter
+    # is called with, or None to find it out by trial and error
+    if inspect.isclass(converter) and issubclass(converter, decimal.Decimal):
+        return 1
+    signature = _positional(converter)
+    if signature is None:
+        return None
+    names, varargs = signature
+    return 3 if varargs else max(min(len(names), 3), 1)
+
+
+def _allowed_choices(choices, case_sensitive):
+    # The choices that values are matched against. Lists and tuples become
+    # sets, so that a value is looked up rather than compared with every
+    # choice, and strings are lowercased once if matching is case
+    # insensitive. Other containers (ranges, dicts, ...) already have fast
+    # lookups and are kept, as are choices that cannot be hashed.
+    if not choices:
+        return None
+    if not case_sensitive and hasattr(choices, '__iter__'):
+        choices = [choice.lower() if isinstance(choice, six.string_types)
+                   else choice for choice in choices]
+    if isinstance(choices, (list, tuple)):
+        try:
+            return frozenset(choices)
+        except TypeError:
+            pass
+    return choices
+
+
+def _is_choice(value, allowed):
+    try:
+        return value in allowed
+    except TypeError:
+        # An unhashable value, compared with each choice
+        return value in list(allowed)
+
 
 class Argument(object):
 
@@ -49,11 +127,14 @@ class Argument(object):
     :param type: The type to which the request argument should be
         converted. If a type raises a ValidationError, the message in the
         error will be returned in the response. Defaults to :py:class:`unicode`
-        in python2 and :py:class:`str` in python3.
+        in python2 and :py:class:`str` in python3. It is called with the value,
+        and the name of the argument and the operator if its signature takes
+        them.
     :param location: The attributes of the :py:class:`flask.Request` object
         to source the arguments from (ex: headers, args, etc.), can be an
         iterator. The last item listed takes precedence in the result set.
     :param choices: A container of the allowable values for the argument.
+        Lists and tuples of hashable values are looked up as a set.
     :param help: A brief description of the argument, returned in the
         response when the argument is invalid. This takes precedence over
         the message passed to a ValidationError raised by a type converter.
@@ -81,10 +162,57 @@ class Argument(object):
         self.operators = operators
         self.store_missing = store_missing
 
+    @property
+    def choices(self):
+        return self._choices
+
+    @choices.setter
+    def choices(self, choices):
+        self._choices = choices
+        self._allowed = _allowed_choices(choices, getattr(self, 'case_sensitive', True))
+
+    @property
+    def case_sensitive(self):
+        return self._case_sensitive
+
+    @case_sensitive.setter
+    def case_sensitive(self, case_sensitive):
+        self._case_sensitive = case_sensitive
+        self._allowed = _allowed_choices(getattr(self, 'choices', ()), case_sensitive)
+
+    @property
+    def type(self):
+        return self._type
+
+    @type.setter
+    def type(self, type):
+        # The signature of the converter is inspected once, here, rather than
+        # found out by calling it on every value
+        self._type = type
+        self._arity = _arity(type)
+        self._string_type = (inspect.isclass(type) and
+                             issubclass(type, six.string_types))
+
     def source(self, request):
-        """Pulls values off the request in the provided location
+        """Pulls values off the request in the provided location. While
+        :meth:`RequestParser.parse_args` runs, the values of each location
+        are pulled once and shared by all the arguments.
+
         :param request: The flask request object to parse arguments from
         """
+        sources = getattr(request, 'argument_sources', None)
+        if type(sources) is not dict:
+            return self._pull(request)
+        location = self.location
+        if not isinstance(location, six.string_types):
+            location = tuple(location)
+        try:
+            return sources[location]
+        except KeyError:
+            source = sources[location] = self._pull(request)
+            return source
+
+    def _pull(self, request):
         if isinstance(self.location, six.string_types):
             value = getattr(request, self.location, MultiDict())
             if callable(value):
@@ -105,17 +233,23 @@ class Argument(object):
 
     def convert(self, value, op):
         # check if we're expecting a string and the value is `None`
-        if value is None and inspect.isclass(self.type) and issubclass(self.type, six.string_types):
+        if value is None and self._string_type:
             return None
 
+        arity = self._arity
+        if arity == 1:
+            return self.type(value)
+        if arity == 2:
+            return self.type(value, self.name)
+        if arity == 3:
+            return self.type(value, self.name, op)
+
+        # The signature could not be inspected: try the arguments it may take
         try:
             return self.type(value, self.name, op)
         except TypeError:
             try:
-                if self.type is decimal.Decimal:
-                    return self.type(str(value), self.name)
-                else:
-                    return self.type(value, self.name)
+                return self.type(value, self.name)
             except TypeError:
                 return self.type(value)
 
@@ -155,8 +289,6 @@ class Argument(object):
                     if not isinstance(value, FileStorage):
                         if not self.case_sensitive:
                             value = value.lower()
-                            if hasattr(self.choices, "__iter__"):
-                                self.choices = [choice.lower() for choice in self.choices]
 
                         try:
                             value = self.convert(value, operator)
@@ -165,7 +297,8 @@ class Argument(object):
                                 continue
                             self.handle_validation_error(error)
 
-                        if self.choices and value not in self.choices:
+                        allowed = self._allowed
+                        if allowed is not None and not _is_choice(value, allowed):
                             self.handle_validation_error(
                                 ValueError(u"{0} is not a valid choice".format(
                                     value
@@ -177,19 +310,7 @@ class Argument(object):
                     results.append(value)
 
         if not results and self.required:
-            if isinstance(self.location, six.string_types):
-                error_msg = u"Missing required parameter {0} in {1}".format(
-                    self.name,
-                    _friendly_location.get(self.location, self.location)
-                )
-            else:
-                friendly_locations = [_friendly_location.get(loc, loc)
-                                      for loc in self.location]
-                error_msg = u"Missing required parameter {0} in {1}".format(
-                    self.name,
-                    ' or '.join(friendly_locations)
-                )
-            self.handle_validation_error(ValueError(error_msg))
+            self.handle_validation_error(ValueError(_missing_message(self)))
 
         if not results:
             if callable(self.default):
@@ -205,6 +326,212 @@ class Argument(object):
         return results, _found
 
 
+def _parse_lines(arg, i, consts, sources):
+    # The statements parsing an argument into the namespace, in the order
+    # Argument.parse runs them. The argument's values are bound as constants
+    # named after its position.
+    def const(name, value):
+        consts['%s_%d' % (name, i)] = value
+        return '%s_%d' % (name, i)
+
+    argument = const('arg', arg)
+    dest = const('dest', arg.dest or arg.name)
+    if _overrides(arg, 'parse'):
+        return ['value, found = %s.parse(req)' % argument,
+                'if found or %s.store_missing:' % argument,
+                '    namespace[%s] = value' % dest]
+
+    # Arguments with the same location share the values pulled off the
+    # request, unless their class pulls them its own way
+    location = arg.location
+    if not isinstance(location, six.string_types):
+        location = tuple(location)
+    lines = []
+    if _overrides(arg, 'source'):
+        source = 'source_%d' % i
+        lines += ['%s = %s.source(req)' % (source, argument),
+                  'multi_%d = hasattr(%s, "getlist")' % (i, source)]
+        multi = 'multi_%d' % i
+    elif location in sources:
+        source, multi = sources[location]
+    else:
+        source, multi = sources[location] = ('source_%d' % i, 'multi_%d' % i)
+        lines += ['%s = %s.source(req)' % (source, argument),
+                  '%s = hasattr(%s, "getlist")' % (multi, source)]
+
+    # The converter is called directly, with the arguments it takes, unless
+    # its signature is unknown or the class converts values its own way
+    direct = not _overrides(arg, 'convert') and arg._arity is not None
+    if direct:
+        converter = const('type', arg.type)
+        params = ['value', const('name', arg.name)]
+    else:
+        converter = const('convert', arg.convert)
+    fail = const('fail', arg.handle_validation_error)
+    if arg._allowed is not None:
+        choices = const('choices', arg._allowed)
+        consts['is_choice'] = _is_choice
+    lines.append('results = []')
+    for j, operator in enumerate(arg.operators):
+        name = const('name_%d' % j, arg.name + operator.replace("=", "", 1))
+        op = const('op_%d' % j, operator)
+        if not direct:
+            convert = '%s(value, %s)' % (converter, op)
+        else:
+            convert = '%s(%s)' % (converter, ', '.join((params + [op])[:arg._arity]))
+            if arg._string_type:
+                convert = 'None if value is None else ' + convert
+        lines += [
+            'if %s in %s:' % (name, source),
+            '    for value in (%s.getlist(%s) if %s else [%s.get(%s)]):' % (
+                source, name, multi, source, name),
+            '        if not isinstance(value, FileStorage):',
+        ]
+        if not arg.case_sensitive:
+            lines.append('            value = value.lower()')
+        lines += [
+            '            try:',
+            '                value = ' + convert,
+            '            except Exception as error:',
+            '                continue' if arg.ignore else '                %s(error)' % fail,
+        ]
+        if arg._allowed is not None:
+            lines += [
+                '            try:',
+                '                valid = value in %s' % choices,
+                '            except TypeError:',
+                '                valid = is_choice(value, %s)' % choices,
+                '            if not valid:',
+                '                %s(ValueError(u"{0} is not a valid choice".format(value)))' % fail,
+            ]
+        lines += [
+            '        if %s in unparsed:' % name,
+            '            unparsed.pop(%s)' % name,
+            '        results.append(value)',
+        ]
+
+    lines.append('if not results:')
+    if arg.required:
+        lines.append('    %s(ValueError(%s))' % (fail, const('missing', _missing_message(arg))))
+    default = const('default', arg.default)
+    value = '%s()' % default if callable(arg.default) else default
+    if arg.store_missing:
+        lines.append('    namespace[%s] = %s' % (dest, value))
+    else:
+        lines.append('    %s' % value if callable(arg.default) else '    pass')
+    if arg.action == 'append':
+        result = 'results'
+    elif arg.action == 'store':
+        result = 'results[0]'
+    else:
+        result = 'results[0] if len(results) == 1 else results'
+    lines += ['else:', '    namespace[%s] = %s' % (dest, result)]
+    return lines
+
+
+def _overrides(arg, method):
+    return (six.get_unbound_function(getattr(type(arg), method)) is not
+            six.get_unbound_function(getattr(Argument, method)))
+
+
+def _missing_message(arg):
+    if isinstance(arg.location, six.string_types):
+        return u"Missing required parameter {0} in {1}".format(
+            arg.name, _friendly_location.get(arg.location, arg.location))
+    friendly_locations = [_friendly_location.get(loc, loc) for loc in arg.location]
+    return u"Missing required parameter {0} in {1}".format(
+        arg.name, ' or '.join(friendly_locations))
+
+
+def _convert_column(arg, values, op):
+    # Converts a column of values with an argument's type. Returns the
+    # converted values, and the errors raised converting them by position. A
+    # converter called directly is run over the whole column at once, and
+    # over each value only if one of them fails.
+    if arg._arity is not None and not _overrides(arg, 'convert'):
+        convert, name = arg.type, arg.name
+        try:
+            if arg._string_type:
+                return [None if value is None else convert(value)
+                        for value in values], {}
+            if arg._arity == 1:
+                return list(map(convert, values)), {}
+            if arg._arity == 2:
+                return [convert(value, name) for value in values], {}
+            return [convert(value, name, op) for value in values], {}
+        except Exception:
+            pass
+
+    converted, failures = [], {}
+    for position, value in enumerate(values):
+        try:
+            converted.append(arg.convert(value, op))
+        except Exception as error:
+            converted.append(None)
+            failures[position] = error
+    return converted, failures
+
+
+def _parse_column(arg, items, rows, errors):
+    # Parses an argument out of the items at the given indexes. Returns the
+    # values found in each item, by index, and records the errors of the
+    # items in errors.
+    found = {}
+    allowed = arg._allowed
+
+    def fail(index, error):
+        message = arg.help if arg.help is not None else str(error)
+        errors.setdefault(index, {}).setdefault(arg.name, message)
+
+    for operator in arg.operators:
+        name = arg.name + operator.replace("=", "", 1)
+        indexes = [index for index in rows if name in items[index]]
+        values = [items[index][name] for index in indexes]
+        if not arg.case_sensitive:
+            values = [value.lower() if isinstance(value, six.string_types)
+                      else value for value in values]
+
+        converted, failures = _convert_column(arg, values, operator)
+        for position, index in enumerate(indexes):
+            if position in failures:
+                if not arg.ignore:
+                    fail(index, failures[position])
+                continue
+            value = converted[position]
+            if allowed is not None and not _is_choice(value, allowed):
+                fail(index, ValueError(u"{0} is not a valid choice".format(value)))
+                continue
+            found.setdefault(index, []).append(value)
+    return found
+
+
+class _ItemRequest(object):
+    # Stands in for the request when an argument class parses the items of
+    # RequestParser.parse_many its own way: the values pulled off its
+    # location are the item's
+    def __init__(self, sources):
+        self.argument_sources = sources
+        self.unparsed_arguments = {}
+
+
+def _parse_items(arg, items, rows, namespaces, errors):
+    # Parses an argument out of the items at the given indexes one at a time,
+    # with Argument.parse, recording the errors it aborts with
+    location = arg.location
+    if not isinstance(location, six.string_types):
+        location = tuple(location)
+    dest = arg.dest or arg.name
+    for index in rows:
+        try:
+            value, found = arg.parse(_ItemRequest({location: items[index]}))
+        except exceptions.HTTPException as error:
+            data = getattr(error, 'data', None) or {}
+            errors.setdefault(index, {})[arg.name] = data.get('message', error.description)
+            continue
+        if found or arg.store_missing:
+            namespaces[index][dest] = value
+
+
 class RequestParser(object):
     """Enables adding and parsing of multiple arguments in the context of a
     single request. Ex::
@@ -248,14 +575,21 @@ class RequestParser(object):
 
         namespace = self.namespace_class()
 
-        # A record of arguments not yet parsed; as each is found
-        # among self.args, it will be popped out
-        req.unparsed_arguments = dict(Argument('').source(req)) if strict else {}
+        # The values pulled off the request, by location, shared by the
+        # arguments
+        req.argument_sources = {}
 
-        for arg in self.args:
-            value, found = arg.parse(req)
-            if found or arg.store_missing:
-                namespace[arg.dest or arg.name] = value
+        try:
+            # A record of arguments not yet parsed; as each is found
+            # among self.args, it will be popped out
+            req.unparsed_arguments = dict(Argument('').source(req)) if strict else {}
+
+            for arg in self.args:
+                value, found = arg.parse(req)
+                if found or arg.store_missing:
+                    namespace[arg.dest or arg.name] = value
+        finally:
+            req.argument_sources = None
 
         if strict and req.unparsed_arguments:
             raise exceptions.BadRequest('Unknown arguments: %s'
@@ -263,6 +597,122 @@ class RequestParser(object):
 
         return namespace
 
+    def parse_many(self, items, strict=False):
+        """Parses the arguments out of each item of a list, such as the objects
+        of a JSON array body, and returns a list of Namespaces. The values are
+        read from the items rather than from the locations of the arguments.
+        Each argument is parsed for all the items at once, and every item is
+        checked: if any is invalid, aborts with a 400 and a message holding
+        the errors of each invalid item, by its position in the list.
+        Arguments of classes overriding :meth:`Argument.parse` or
+        :meth:`Argument.handle_validation_error` parse one item at a time,
+        with the item standing in for the values of their location. ::
+
+            parser = RequestParser()
+            parser.add_argument('name', required=True)
+            parser.add_argument('age', type=int)
+            people = parser.parse_many(request.get_json())
+
+        :param items: A list of dicts
+        :param strict: if an item includes keys not in parser, it is invalid
+        """
+        if not isinstance(items, (list, tuple)):
+            flask_restful.abort(400, message=u"Expected a list of objects")
+
+        errors = {}
+        rows = []
+        for index, item in enumerate(items):
+            if isinstance(item, dict):
+                rows.append(index)
+            else:
+                errors[index] = u"Expected an object"
+
+        namespaces = [self.namespace_class() for _ in items]
+        for arg in self.args:
+            if _overrides(arg, 'parse') or _overrides(arg, 'handle_validation_error'):
+                _parse_items(arg, items, rows, namespaces, errors)
+                continue
+            found = _parse_column(arg, items, rows, errors)
+            dest = arg.dest or arg.name
+            for index in rows:
+                results = found.get(index)
+                if results:
+                    if arg.action == 'append':
+                        value = results
+                    elif arg.action == 'store' or len(results) == 1:
+                        value = results[0]
+                    else:
+                        value = results
+                elif arg.name in errors.get(index, ()):
+                    continue
+                elif arg.required:
+                    message = u"Missing required parameter {0}".format(arg.name)
+                    errors.setdefault(index, {})[arg.name] = (
+                        arg.help if arg.help is not None else message)
+                    continue
+                elif not arg.store_missing:
+                    continue
+                elif callable(arg.default):
+                    value = arg.default()
+                else:
+                    value = arg.default
+                namespaces[index][dest] = value
+
+        if strict:
+            known = set(arg.name + operator.replace("=", "", 1)
+                        for arg in self.args for operator in arg.operators)
+            for index in rows:
+                for key in items[index]:
+                    if key not in known:
+                        errors.setdefault(index, {})[key] = u"Unknown argument"
+
+        if errors:
+            flask_restful.abort(400, message=errors)
+        return namespaces
+
+    def compile(self):
+        """Generates a function parsing all the arguments in one pass, with
+        the same results and errors as :meth:`parse_args`, and the same
+        signature. The names, operators, converters, defaults and choices of
+        the arguments are bound into the function as constants, so changes
+        made to the arguments afterwards are not seen; compile the parser
+        again. Arguments of classes overriding :meth:`Argument.parse` are
+        parsed by calling it. ::
+
+            parse = parser.compile()
+            args = parse()
+        """
+        consts = {
+            'request': request,
+            'FileStorage': FileStorage,
+            'BadRequest': exceptions.BadRequest,
+            'namespace_class': self.namespace_class,
+            'all_arguments': Argument(''),
+        }
+        lines = [
+            'def parse(req=None, strict=False):',
+            '    if req is None:',
+            '        req = request',
+            '    namespace = namespace_class()',
+            '    req.argument_sources = {}',
+            '    try:',
+            "        req.unparsed_arguments = dict(all_arguments.source(req)) if strict else {}",
+            '        unparsed = req.unparsed_arguments',
+        ]
+        sources = {}
+        for i, arg in enumerate(self.args):
+            lines.extend('        ' + line for line in _parse_lines(arg, i, consts, sources))
+        lines.extend([
+            '    finally:',
+            '        req.argument_sources = None',
+            '    if strict and req.unparsed_arguments:',
+            "        raise BadRequest('Unknown arguments: %s'",
+            "                         % ', '.join(req.unparsed_arguments.keys()))",
+            '    return namespace',
+        ])
+        exec(compile('\n'.join(lines), '<parser %s>' % id(self), 'exec'), consts)
+        return consts['parse']
+
     def copy(self):
         """ Creates a copy of this RequestParser with the same set of arguments """
         parser_copy = RequestParser(self.argument_class, self.namespace_class)
@@ -3,9 +3,68 @@ try:
 except ImportError:
     from ordereddict import OrderedDict
 
+import threading
+
 from werkzeug.http import HTTP_STATUS_CODES
 
 
+class KeyValuePairs(tuple):
+    """A lightweight, read-only record: a tuple of ``(key, value)`` pairs.
+    It takes less memory and is faster to build than a dict, and the JSON
+    representation encodes it as an object. Pass it as the ``dict_class`` of
+    :func:`~flask.ext.restful.marshal` to get records of this type.
+    """
+    __slots__ = ()
+
+    def items(self):
+        return list(self)
+
+    def keys(self):
+        return [key for key, _ in self]
+
+    def values(self):
+        return [value for _, value in self]
+
+
+class LRUCache(object):
+    """A thread-safe mapping holding at most ``maxsize`` items. When it is
+    full, the least recently used item is dropped to make room.
+
+    :param int maxsize: The maximum number of items
+    """
+
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+
 def http_status_message(code):
     """Maps an HTTP status code to the textual status"""
     return HTTP_STATUS_CODES.get(code, '')
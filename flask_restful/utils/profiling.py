@@ -0,0 +1,154 @@
+"""Per-field timings of marshal calls.
+
+A :class:`FieldProfile` accumulates the number of calls and the cumulative
+time spent in each field, by the path of the field in the output, e.g.
+``items[].author.created_at``. It also counts slow operations, such as the
+urls fields build and the :class:`~decimal.Decimal` numbers they construct.
+"""
+from __future__ import absolute_import
+from contextlib import contextmanager
+import threading
+from timeit import default_timer
+
+#: The number of profiles being recorded, in all threads. Fields check it
+#: before counting their slow operations, so that they pay next to nothing
+#: while nothing is being profiled.
+active = 0
+
+_active_lock = threading.Lock()
+
+
+class _Recording(threading.local):
+    # The profile recorded by the marshal call running in this thread, and
+    # the path of the field being output
+    profile = None
+    path = ()
+
+
+_recording = _Recording()
+
+
+class FieldProfile(object):
+    """Cumulative timings of marshalled fields, by field path. Safe to
+    :meth:`merge` into from several threads."""
+
+    def __init__(self):
+        # path -> [field class name, calls, seconds]
+        self.fields = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def add(self, path, field, calls, seconds):
+        """Records ``calls`` calls of a field taking ``seconds`` in all"""
+        stats = self.fields.get(path)
+        if stats is None:
+            self.fields[path] = [field, calls, seconds]
+        else:
+            stats[1] += calls
+            stats[2] += seconds
+
+    def count(self, name, n=1):
+        """Counts ``n`` more operations of the given name"""
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, other):
+        """Adds up the timings and counters of another profile"""
+        with self._lock:
+            for path, (field, calls, seconds) in other.fields.items():
+                self.add(path, field, calls, seconds)
+            for name, n in other.counters.items():
+                self.count(name, n)
+
+    def report(self, reset=False):
+        """Returns the timings as a dict: ``fields`` lists the fields, slowest
+        first, each with its ``path``, ``field`` class, number of ``calls``
+        and cumulative ``seconds``. ``counters`` holds the operation counts.
+        The time of a field includes the time of the fields nested in it.
+
+        :param bool reset: Whether to forget the timings once reported
+        """
+        with self._lock:
+            fields = [{'path': format_path(path), 'field': field, 'calls': calls,
+                       'seconds': seconds}
+                      for path, (field, calls, seconds) in self.fields.items()]
+            counters = dict(self.counters)
+            if reset:
+                self.fields = {}
+                self.counters = {}
+        fields.sort(key=lambda stats: (-stats['seconds'], stats['path']))
+        return {'fields': fields, 'counters': counters}
+
+
+def format_path(path):
+    """Joins the segments of a field path with dots, marking lists with
+    ``[]``, e.g. ``('items', '[]', 'author')`` gives ``items[].author``"""
+    text = ''
+    for segment in path:
+        if segment == '[]' or not text:
+            text += segment
+        else:
+            text += '.' + segment
+    return text
+
+
+@contextmanager
+def recording(profile):
+    """Records the fields output in this thread into the given profile, for
+    the duration of the block"""
+    global active
+    previous = _recording.profile, _recording.path
+    with _active_lock:
+        active += 1
+    _recording.profile, _recording.path = profile, ()
+    try:
+        yield profile
+    finally:
+        _recording.profile, _recording.path = previous
+        with _active_lock:
+            active -= 1
+
+
+@contextmanager
+def scope(*segments):
+    """Adds segments to the path of the fields output in the block. Empty
+    segments are skipped."""
+    path = _recording.path
+    _recording.path = path + tuple(segment for segment in segments if segment)
+    try:
+        yield
+    finally:
+        _recording.path = path
+
+
+def timed(segments, field, output, per_row=False):
+    """Wraps the output function of a field so that its calls are recorded
+    under its path while a profile is being recorded.
+
+    :param tuple segments: The segments the field adds to the path
+    :param field: The name of the field class
+    :param output: The function to time
+    :param per_row: Whether the function outputs a column of values, one per
+                    record of its argument
+    """
+    def output_timed(arg):
+        profile = _recording.profile
+        if profile is None:
+            return output(arg)
+        path = _recording.path
+        _recording.path = full_path = path + segments
+        start = default_timer()
+        try:
+            return output(arg)
+        finally:
+            profile.add(full_path, field, len(arg) if per_row else 1,
+                        default_timer() - start)
+            _recording.path = path
+    return output_timed
+
+
+def count(name, n=1):
+    """Counts operations of the given name in the profile being recorded in
+    this thread, if any"""
+    profile = _recording.profile
+    if profile is not None:
+        profile.count(name, n)
@@ -175,6 +175,21 @@ class APITestCase(unittest.TestCase):
         output = flask_restful.marshal((marshal_fields,), fields, envelope='hey')
         self.assertEquals(output, {'hey': [{'foo': 'bar'}]})
 
+    def test_marshal_nested_lists(self):
+        fields = {'a': flask_restful.fields.Raw}
+        data = [[{'a': 1}, {'a': 2}], ({'a': 3},), {'a': 4}]
+        expected = [[{'a': 1}, {'a': 2}], [{'a': 3}], {'a': 4}]
+        self.assertEquals(flask_restful.marshal(data, fields), expected)
+        self.assertEquals(loads(flask_restful.compile_fields(fields).encode(data).decode('utf-8')),
+                          expected)
+        loader = flask_restful.fields.Loader(lambda keys: [key * 10 for key in keys])
+        self.assertEquals(flask_restful.marshal(data, {'a': flask_restful.fields.Raw(loader=loader)}),
+                          [[{'a': 10}, {'a': 20}], [{'a': 30}], {'a': 40}])
+
+        nested = {'fee': flask_restful.fields.Nested(fields)}
+        output = flask_restful.marshal({'fee': [[{'a': 1}], [{'a': 2}]]}, nested)
+        self.assertEquals(output, {'fee': [[{'a': 1}], [{'a': 2}]]})
+
     def test_marshal_nested(self):
         fields = OrderedDict([
             ('foo', flask_restful.fields.Raw),
@@ -297,6 +312,807 @@ class APITestCase(unittest.TestCase):
         expected = OrderedDict([('foo', 'foo-val'), ('bar', OrderedDict([('a', 1), ('b', 2)]))])
         self.assertEquals(output, expected)
 
+    def test_compile_fields(self):
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.Raw),
+            ('bar', OrderedDict([('a', flask_restful.fields.Integer)])),
+        ])
+        marshaller = flask_restful.compile_fields(fields)
+        self.assertTrue(isinstance(marshaller, flask_restful.Marshaller))
+        output = marshaller([{'foo': 'a', 'a': '1'}, {'foo': 'b', 'a': 2}])
+        expected = [OrderedDict([('foo', 'a'), ('bar', OrderedDict([('a', 1)]))]),
+                    OrderedDict([('foo', 'b'), ('bar', OrderedDict([('a', 2)]))])]
+        self.assertEquals(output, expected)
+
+    def test_compile_fields_instantiates_fields_once(self):
+        instances = []
+
+        class CountingField(flask_restful.fields.Raw):
+            def __init__(self, **kwargs):
+                super(CountingField, self).__init__(**kwargs)
+                instances.append(self)
+
+        marshaller = flask_restful.compile_fields({'foo': CountingField})
+        output = marshaller([{'foo': 1}, {'foo': 2}, {'foo': 3}])
+        self.assertEquals(output, [{'foo': 1}, {'foo': 2}, {'foo': 3}])
+        self.assertEquals(len(instances), 1)
+
+    def test_compile_fields_marshaller(self):
+        fields = OrderedDict([('foo', flask_restful.fields.Raw)])
+        marshaller = flask_restful.compile_fields(fields)
+        self.assertTrue(flask_restful.compile_fields(marshaller) is marshaller)
+        enveloped = flask_restful.compile_fields(marshaller, envelope='hey')
+        self.assertEquals(enveloped({'foo': 'bar'}), {'hey': {'foo': 'bar'}})
+        self.assertEquals(marshaller({'foo': 'bar'}), {'foo': 'bar'})
+
+    def test_marshal_with_marshaller(self):
+        marshaller = flask_restful.compile_fields({'foo': flask_restful.fields.Raw})
+        output = flask_restful.marshal({'foo': 'bar', 'bat': 'baz'}, marshaller, envelope='hey')
+        self.assertEquals(output, {'hey': {'foo': 'bar'}})
+
+    def test_marshal_many(self):
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.Raw),
+            ('num', flask_restful.fields.Integer),
+            ('fee', flask_restful.fields.Nested({
+                'fye': flask_restful.fields.String,
+            }, allow_null=True)),
+            ('bar', OrderedDict([('a', flask_restful.fields.Raw)])),
+        ])
+        data = [
+            {'foo': 'a', 'num': '1', 'fee': {'fye': 'fum'}, 'a': 1},
+            {'foo': 'b', 'num': None, 'fee': None},
+            {'foo': 'c', 'num': 3, 'fee': [{'fye': 'x'}], 'a': 3},
+        ]
+        self.assertEquals(flask_restful.marshal_many(data, fields),
+                          flask_restful.marshal(data, fields))
+
+    def test_marshal_many_with_envelope(self):
+        fields = OrderedDict([('foo', flask_restful.fields.Raw)])
+        data = (OrderedDict([('foo', 'bar'), ('bat', 'baz')]) for _ in range(2))
+        output = flask_restful.marshal_many(data, fields, envelope='hey')
+        self.assertEquals(output, {'hey': [{'foo': 'bar'}, {'foo': 'bar'}]})
+
+    def test_marshal_many_no_fields(self):
+        self.assertEquals(flask_restful.marshal_many([{'a': 1}, {}], {}), [{}, {}])
+
+    def test_marshal_dict_class(self):
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.Raw),
+            ('fee', flask_restful.fields.Nested({'fye': flask_restful.fields.String})),
+            ('fum', flask_restful.fields.List(flask_restful.fields.Nested({'a': flask_restful.fields.Raw}))),
+            ('bar', OrderedDict([('a', flask_restful.fields.Raw)])),
+        ])
+        data = {'foo': 1, 'fee': {'fye': 2}, 'fum': [{'a': 3}], 'a': 4}
+        output = flask_restful.marshal([data], fields, envelope='hey', dict_class=dict)
+        self.assertEquals(output, {'hey': [{'foo': 1, 'fee': {'fye': '2'}, 'fum': [{'a': 3}], 'bar': {'a': 4}}]})
+        self.assertTrue(type(output) is dict)
+        record = output['hey'][0]
+        for value in (record, record['fee'], record['fum'][0], record['bar']):
+            self.assertTrue(type(value) is dict)
+        self.assertTrue(type(flask_restful.marshal(data, fields)['fee']) is OrderedDict)
+
+    def test_marshal_key_value_pairs(self):
+        from flask_restful.utils import KeyValuePairs
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.Raw),
+            ('fee', flask_restful.fields.Nested({'fye': flask_restful.fields.String})),
+        ])
+        output = flask_restful.marshal({'foo': 1, 'fee': {'fye': 2}}, fields,
+                                       dict_class=KeyValuePairs)
+        self.assertEquals(output, (('foo', 1), ('fee', (('fye', '2'),))))
+        self.assertTrue(type(output[1][1]) is KeyValuePairs)
+
+    def test_key_value_pairs_json(self):
+        from flask_restful.utils import KeyValuePairs
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.Raw),
+            ('fee', flask_restful.fields.Nested({'fye': flask_restful.fields.String})),
+        ])
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with(fields, envelope='items', dict_class=KeyValuePairs)
+            def get(self):
+                return [{'foo': {'a': [1.5, None, True]}, 'fee': {'fye': u'\xe9'}}]
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(resp.data.decode('utf-8'),
+                              '{"items": [{"foo": {"a": [1.5, null, true]}, "fee": {"fye": "\\u00e9"}}]}')
+
+    def test_nested_key_value_pairs_json(self):
+        from flask_restful.utils import KeyValuePairs
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        fields = {'author': flask_restful.fields.Nested(
+            OrderedDict([('name', flask_restful.fields.String),
+                         ('age', flask_restful.fields.Integer)]),
+            dict_class=KeyValuePairs)}
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with(fields)
+            def get(self):
+                return [{'author': {'name': 'bob', 'age': 3}}]
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(resp.data.decode('utf-8'),
+                              '[{"author": {"name": "bob", "age": 3}}]')
+
+        app.debug = True
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              [{'author': {'name': 'bob', 'age': 3}}])
+            self.assertTrue(resp.data.decode('utf-8').startswith('[\n    {'))
+            self.assertTrue(resp.data.decode('utf-8').index('"age"') <
+                            resp.data.decode('utf-8').index('"name"'))
+
+    def test_key_value_pairs_marked(self):
+        from flask_restful.utils import KeyValuePairs
+        from flask_restful.representations.json import output_json, mark_pairs
+        app = Flask(__name__)
+        data = {'author': {'name': 'bob'}}
+        with app.test_request_context('/'):
+            flask_restful.marshal(data, {'author': flask_restful.fields.Nested(
+                {'name': flask_restful.fields.String})})
+            self.assertFalse(getattr(flask._request_ctx_stack.top, 'restful_pairs', False))
+            flask_restful.marshal(data, {'author': flask_restful.fields.Nested(
+                {'name': flask_restful.fields.String}, dict_class=KeyValuePairs)})
+            self.assertTrue(flask._request_ctx_stack.top.restful_pairs)
+
+        with app.test_request_context('/'):
+            mark_pairs()
+            resp = output_json({'author': KeyValuePairs([('name', 'bob')])}, 200)
+            self.assertEquals(resp.data.decode('utf-8'), '{"author": {"name": "bob"}}')
+
+    def _memo_fields(self, calls):
+        class Counting(flask_restful.fields.Raw):
+            def format(self, value):
+                calls.append(value)
+                return value
+
+        return OrderedDict([
+            ('id', flask_restful.fields.Raw),
+            ('author', flask_restful.fields.Nested(OrderedDict([
+                ('name', Counting),
+                ('tags', flask_restful.fields.List(flask_restful.fields.String)),
+            ]), allow_null=True)),
+        ])
+
+    def test_marshal_memo_copy(self):
+        calls = []
+        author = {'name': 'bob', 'tags': ['a']}
+        data = [{'id': 1, 'author': author}, {'id': 2, 'author': author},
+                {'id': 3, 'author': dict(author)}, {'id': 4, 'author': None}]
+        output = flask_restful.marshal(data, self._memo_fields(calls), memo=True)
+        self.assertEquals(output, flask_restful.marshal(data, self._memo_fields([])))
+        self.assertEquals(calls, ['bob', 'bob'])
+        self.assertFalse(output[0]['author'] is output[1]['author'])
+        self.assertFalse(output[0]['author']['tags'] is output[1]['author']['tags'])
+
+    def test_marshal_memo_share(self):
+        calls = []
+        author = {'name': 'bob', 'tags': ['a']}
+        data = [{'id': 1, 'author': author}, {'id': 2, 'author': author}]
+        output = flask_restful.marshal(data, self._memo_fields(calls), memo='share')
+        self.assertEquals(calls, ['bob'])
+        self.assertTrue(output[0]['author'] is output[1]['author'])
+
+    def test_marshal_memo_per_call(self):
+        calls = []
+        marshaller = flask_restful.compile_fields(self._memo_fields(calls), memo='share')
+        author = {'name': 'bob', 'tags': []}
+        first = marshaller({'id': 1, 'author': author})
+        second = marshaller({'id': 2, 'author': author})
+        self.assertEquals(calls, ['bob', 'bob'])
+        self.assertFalse(first['author'] is second['author'])
+
+    def test_marshal_many_memo(self):
+        calls = []
+        authors = [{'name': 'bob', 'tags': []}, {'name': 'alice', 'tags': []}]
+        data = [{'id': i, 'author': authors[i % 2]} for i in range(6)]
+        output = flask_restful.marshal_many(data, self._memo_fields(calls), memo='copy')
+        self.assertEquals(output, flask_restful.marshal(data, self._memo_fields([])))
+        self.assertEquals(calls, ['bob', 'alice'])
+
+    def test_encode_memo(self):
+        calls = []
+        author = {'name': 'bob', 'tags': ['a']}
+        data = [{'id': 1, 'author': author}, {'id': 2, 'author': author}]
+        marshaller = flask_restful.compile_fields(self._memo_fields(calls), memo=True)
+        self.assertEquals(marshaller.encode(data),
+                          dumps(flask_restful.marshal(data, self._memo_fields([]))).encode('utf-8'))
+        self.assertEquals(calls, ['bob'])
+
+    def test_marshal_memo_invalid(self):
+        self.assertRaises(ValueError, flask_restful.marshal, {}, {}, memo='always')
+
+    def test_project_fields(self):
+        author = OrderedDict([('name', flask_restful.fields.String), ('email', flask_restful.fields.String)])
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('title', flask_restful.fields.String),
+            ('author', flask_restful.fields.Nested(author)),
+            ('tags', flask_restful.fields.List(flask_restful.fields.Nested(author))),
+            ('meta', OrderedDict([('a', flask_restful.fields.Raw), ('b', flask_restful.fields.Raw)])),
+        ])
+        projected = flask_restful.project_fields(fields, ['meta.b', 'author.name', 'tags.email', 'id'])
+        self.assertEquals(list(projected), ['id', 'author', 'tags', 'meta'])
+        data = {'id': 1, 'title': 't', 'author': {'name': 'bob', 'email': 'b@x'},
+                'tags': [{'name': 'n', 'email': 'e'}], 'a': 1, 'b': 2}
+        self.assertEquals(flask_restful.marshal(data, projected),
+                          {'id': 1, 'author': {'name': 'bob'}, 'tags': [{'email': 'e'}], 'meta': {'b': 2}})
+        self.assertEquals(flask_restful.marshal(data, fields)['author'], {'name': 'bob', 'email': 'b@x'})
+        whole = flask_restful.project_fields(fields, ['author.name', 'author'])
+        self.assertTrue(whole['author'] is fields['author'])
+
+    def test_project_fields_unknown(self):
+        fields = {'id': flask_restful.fields.Integer,
+                  'author': flask_restful.fields.Nested({'name': flask_restful.fields.String})}
+        self.assertRaises(ValueError, flask_restful.project_fields, fields, ['nope'])
+        self.assertRaises(ValueError, flask_restful.project_fields, fields, ['author.nope'])
+        self.assertRaises(ValueError, flask_restful.project_fields, fields, ['id.nope'])
+
+    def test_marshal_with_sparse(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('title', flask_restful.fields.String),
+            ('author', flask_restful.fields.Nested({'name': flask_restful.fields.String,
+                                                    'email': flask_restful.fields.String})),
+        ])
+        decorator = flask_restful.marshal_with(fields, envelope='items', sparse=True)
+
+        class FooResource(flask_restful.Resource):
+            @decorator
+            def get(self):
+                return [{'id': 1, 'title': 't', 'author': {'name': 'bob', 'email': 'b@x'}}]
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api?fields=author.name,id')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              {'items': [{'id': 1, 'author': {'name': 'bob'}}]})
+            resp = client.get('/api?fields=id&fields=author.name')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              {'items': [{'id': 1, 'author': {'name': 'bob'}}]})
+            self.assertEquals(len(decorator._projections), 1)
+            resp = client.get('/api')
+            self.assertEquals(len(loads(resp.data.decode('utf-8'))['items'][0]), 3)
+            resp = client.get('/api?fields=id,secret')
+            self.assertEquals(resp.status_code, 400)
+            self.assertTrue('secret' in loads(resp.data.decode('utf-8'))['message'])
+
+    def test_marshal_with_sparse_outside_request(self):
+        fields = {'id': flask_restful.fields.Integer}
+
+        @flask_restful.marshal_with(fields, sparse=True)
+        def get():
+            return {'id': 1, 'title': 't'}
+
+        self.assertEquals(get(), {'id': 1})
+
+    def test_expand_fields(self):
+        user = {'name': flask_restful.fields.String}
+        post = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('author', flask_restful.fields.Nested(user, expand_only=True,
+                                                   reference=flask_restful.fields.Raw(attribute='author_id'))),
+        ])
+        fields = OrderedDict([
+            ('author', flask_restful.fields.Nested(user, expand_only=True)),
+            ('posts', flask_restful.fields.List(flask_restful.fields.Nested(post))),
+        ])
+        data = {'author': {'name': 'bob'},
+                'posts': [{'id': 1, 'author_id': 2, 'author': {'name': 'alice'}}]}
+        self.assertEquals(flask_restful.marshal(data, fields),
+                          {'author': None, 'posts': [{'id': 1, 'author': 2}]})
+        expanded = flask_restful.expand_fields(fields, ['posts.author', 'author'])
+        self.assertEquals(flask_restful.marshal(data, expanded),
+                          {'author': {'name': 'bob'}, 'posts': [{'id': 1, 'author': {'name': 'alice'}}]})
+        self.assertEquals(flask_restful.marshal(data, fields)['author'], None)
+        self.assertRaises(ValueError, flask_restful.expand_fields, fields, ['posts.id'])
+        self.assertRaises(ValueError, flask_restful.expand_fields, fields, ['nope'])
+
+    def test_marshal_with_expand(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('author', flask_restful.fields.Nested({'name': flask_restful.fields.String}, expand_only=True,
+                                                   reference=flask_restful.fields.Raw(attribute='author_id'))),
+        ])
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with(fields, encode=True)
+            def get(self):
+                return {'id': 1, 'author_id': 2, 'author': {'name': 'bob'}}
+
+        class BarResource(flask_restful.Resource):
+            @flask_restful.marshal_with({'id': flask_restful.fields.Integer})
+            def get(self):
+                return {'id': 1}
+
+        api.add_resource(FooResource, '/foo')
+        api.add_resource(BarResource, '/bar')
+
+        with app.test_client() as client:
+            resp = client.get('/foo')
+            self.assertEquals(loads(resp.data.decode('utf-8')), {'id': 1, 'author': 2})
+            resp = client.get('/foo?expand=author')
+            self.assertEquals(loads(resp.data.decode('utf-8')), {'id': 1, 'author': {'name': 'bob'}})
+            resp = client.get('/foo?expand=id')
+            self.assertEquals(resp.status_code, 400)
+            resp = client.get('/bar?expand=whatever')
+            self.assertEquals(loads(resp.data.decode('utf-8')), {'id': 1})
+
+    def _loader_fields(self, calls):
+        def loader(name):
+            def batch(keys):
+                calls.append((name, keys))
+                return dict((key, '%s %s' % (name, key)) for key in keys)
+            return flask_restful.fields.Loader(batch)
+
+        comment = OrderedDict([
+            ('author', flask_restful.fields.String(attribute='user_id', loader=loader('user'))),
+        ])
+        return OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('title', flask_restful.fields.String(attribute='id', loader=loader('title'))),
+            ('top_comment', flask_restful.fields.Nested(comment)),
+        ])
+
+    def test_marshal_with_loaders(self):
+        calls = []
+        fields = self._loader_fields(calls)
+        data = [{'id': i, 'top_comment': {'user_id': i % 2}} for i in range(4)]
+        expected = [OrderedDict([('id', i), ('title', 'title %d' % i),
+                                 ('top_comment', OrderedDict([('author', 'user %d' % (i % 2))]))])
+                    for i in range(4)]
+        self.assertEquals(flask_restful.marshal(data, fields), expected)
+        self.assertEquals(sorted(calls), [('title', [0, 1, 2, 3]), ('user', [0, 1])])
+
+        del calls[:]
+        self.assertEquals(flask_restful.compile_fields(fields).encode(data),
+                          dumps(expected).encode('utf-8'))
+        self.assertEquals(len(calls), 2)
+
+        del calls[:]
+        self.assertEquals(flask_restful.marshal(data[1], fields), expected[1])
+        self.assertEquals(len(calls), 2)
+
+    def test_marshal_list_with_loaders(self):
+        calls = []
+        comment = self._loader_fields(calls)['top_comment'].nested
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('comments', flask_restful.fields.List(flask_restful.fields.Nested(comment))),
+            ('threads', flask_restful.fields.List(flask_restful.fields.List(
+                flask_restful.fields.Nested(comment)))),
+        ])
+        data = [{'id': i, 'comments': [{'user_id': 7}, {'user_id': i}],
+                 'threads': [[{'user_id': 8}], [], [{'user_id': i + 10}]]}
+                for i in range(3)]
+        data.append({'id': 3, 'comments': None, 'threads': [None]})
+        expected = [OrderedDict([
+            ('id', i),
+            ('comments', [OrderedDict([('author', 'user 7')]),
+                          OrderedDict([('author', 'user %d' % i)])]),
+            ('threads', [[OrderedDict([('author', 'user 8')])], [],
+                         [OrderedDict([('author', 'user %d' % (i + 10))])]]),
+        ]) for i in range(3)]
+        expected.append(OrderedDict([('id', 3), ('comments', None), ('threads', [None])]))
+
+        self.assertEquals(flask_restful.marshal(data, fields), expected)
+        self.assertEquals(calls, [('user', [7, 0, 1, 2]), ('user', [8, 10, 11, 12])])
+
+        del calls[:]
+        self.assertEquals(flask_restful.compile_fields(fields).encode(data),
+                          dumps(expected).encode('utf-8'))
+        self.assertEquals(len(calls), 2)
+
+    def test_marshal_with_loader_pool(self):
+        from multiprocessing.pool import ThreadPool
+        calls = []
+        fields = self._loader_fields(calls)
+        fields['author'] = flask_restful.fields.String(
+            attribute='id', loader=fields['top_comment'].nested['author'].loader)
+        data = [{'id': i, 'top_comment': {'user_id': 5}} for i in range(3)]
+        pool = ThreadPool(2)
+        try:
+            output = flask_restful.marshal(data, fields, loader_pool=pool)
+        finally:
+            pool.close()
+        self.assertEquals([record['author'] for record in output], ['user 0', 'user 1', 'user 2'])
+        self.assertEquals(output[0]['title'], 'title 0')
+        self.assertEquals(sorted(calls), [('title', [0, 1, 2]), ('user', [0, 1, 2]), ('user', [5])])
+
+    def test_field_profile(self):
+        app = Flask(__name__)
+        app.config['RESTFUL_PROFILE_FIELDS'] = True
+        app.add_url_rule('/items/<int:id>', 'item', view_func=lambda id: '')
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('uri', flask_restful.fields.Url('item')),
+            ('price', flask_restful.fields.Fixed(2)),
+            ('author', flask_restful.fields.Nested({'name': flask_restful.fields.String})),
+            ('comments', flask_restful.fields.List(flask_restful.fields.Nested({
+                'text': flask_restful.fields.String}))),
+        ])
+        data = [{'id': i, 'price': '1.5', 'author': {'name': 'bob'},
+                 'comments': [{'text': 'a'}, {'text': 'b'}]} for i in range(3)]
+        with app.test_request_context('/'):
+            self.assertEquals(flask_restful.marshal(data, fields, envelope='items'),
+                              flask_restful.marshal(data, flask_restful.compile_fields(fields),
+                                                    envelope='items'))
+            report = flask_restful.field_profile(reset=True)
+            self.assertEquals(flask_restful.field_profile(), {'fields': [], 'counters': {}})
+
+        stats = dict((stat['path'], stat) for stat in report['fields'])
+        self.assertEquals(sorted(stats), ['items[].author', 'items[].author.name',
+                                          'items[].comments[]', 'items[].comments[].text',
+                                          'items[].id', 'items[].price', 'items[].uri'])
+        self.assertEquals(stats['items[].price']['field'], 'Fixed')
+        self.assertEquals(stats['items[].price']['calls'], 6)
+        self.assertEquals(stats['items[].comments[].text']['calls'], 12)
+        self.assertTrue(stats['items[].author']['seconds'] >= stats['items[].author.name']['seconds'])
+        self.assertEquals(report['counters'], {'url_for': 6, 'Decimal': 6})
+
+    def test_field_profile_off(self):
+        app = Flask(__name__)
+        with app.app_context():
+            flask_restful.marshal({'id': 1}, {'id': flask_restful.fields.Fixed})
+            self.assertEquals(flask_restful.field_profile(), {'fields': [], 'counters': {}})
+
+    def test_field_profile_resource(self):
+        app = Flask(__name__)
+        app.config['RESTFUL_PROFILE_FIELDS'] = True
+        api = flask_restful.Api(app)
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with({'id': flask_restful.fields.Integer}, encode=True)
+            def get(self):
+                return [{'id': 1}, {'id': 2}]
+
+        api.add_resource(FooResource, '/foo')
+        api.add_resource(flask_restful.FieldProfileResource, '/profile')
+
+        with app.test_client() as client:
+            self.assertEquals(loads(client.get('/foo').data.decode('utf-8')), [{'id': 1}, {'id': 2}])
+            report = loads(client.get('/profile?reset').data.decode('utf-8'))
+            self.assertEquals([(stat['path'], stat['calls']) for stat in report['fields']],
+                              [('[].id', 2)])
+            report = loads(client.get('/profile').data.decode('utf-8'))
+            self.assertEquals(report['fields'], [])
+
+    def test_marshal_cache(self):
+        calls = []
+
+        class Counted(flask_restful.fields.Raw):
+            def format(self, value):
+                calls.append(value)
+                return value
+
+        fields = {'name': Counted}
+        cache = flask_restful.MarshalCache()
+        data = [{'id': 1, 'version': 1, 'name': 'a'}, {'id': 2, 'version': 1, 'name': 'b'}]
+        self.assertEquals(flask_restful.marshal(data, fields, envelope='items', cache=cache),
+                          {'items': [{'name': 'a'}, {'name': 'b'}]})
+        self.assertEquals(flask_restful.marshal(data, fields, cache=cache),
+                          [{'name': 'a'}, {'name': 'b'}])
+        self.assertEquals(calls, ['a', 'b'])
+        self.assertEquals((cache.hits, cache.misses, len(cache)), (2, 2, 2))
+
+        data[1] = {'id': 2, 'version': 2, 'name': 'c'}
+        self.assertEquals(flask_restful.marshal(data[1], fields, cache=cache), {'name': 'c'})
+        self.assertEquals(calls, ['a', 'b', 'c'])
+        self.assertEquals(len(cache), 2)
+
+        # Another schema gets its own records
+        self.assertEquals(flask_restful.marshal(data[0], {'name': Counted}, cache=cache),
+                          {'name': 'a'})
+        self.assertEquals(calls, ['a', 'b', 'c', 'a'])
+
+        cache.invalidate(1)
+        self.assertEquals(len(cache), 1)
+        flask_restful.marshal(data, fields, cache=cache)
+        self.assertEquals(calls, ['a', 'b', 'c', 'a', 'a'])
+        cache.invalidate()
+        self.assertEquals((len(cache), cache.size), (0, 0))
+
+    def test_marshal_cache_uncacheable(self):
+        cache = flask_restful.MarshalCache()
+        fields = {'name': flask_restful.fields.Raw}
+        data = [{'id': 1, 'name': 'a'}, {'name': 'b'}]
+        self.assertEquals(flask_restful.marshal(data, fields, cache=cache),
+                          [{'name': 'a'}, {'name': 'b'}])
+        self.assertEquals(len(cache), 0)
+        cache = flask_restful.MarshalCache(version=None)
+        flask_restful.marshal(data, fields, cache=cache)
+        self.assertEquals(len(cache), 1)
+
+    def test_marshal_cache_eviction(self):
+        cache = flask_restful.MarshalCache(maxsize=10, key=lambda obj: obj['name'],
+                                           version=None, sizeof=lambda record: len(record['name']))
+        fields = {'name': flask_restful.fields.Raw}
+        flask_restful.marshal([{'name': 'aaaa'}, {'name': 'bbbb'}], fields, cache=cache)
+        self.assertEquals(cache.size, 8)
+        flask_restful.marshal({'name': 'aaaa'}, fields, cache=cache)
+        flask_restful.marshal({'name': 'cccc'}, fields, cache=cache)
+        self.assertEquals((len(cache), cache.size), (2, 8))
+        flask_restful.marshal({'name': 'aaaa'}, fields, cache=cache)
+        self.assertEquals(cache.hits, 2)
+        flask_restful.marshal({'name': 'x' * 11}, fields, cache=cache)
+        self.assertEquals(len(cache), 2)
+
+    def test_marshal_with_cache(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        cache = flask_restful.MarshalCache(key='id', version='updated')
+        fields = OrderedDict([('id', flask_restful.fields.Integer),
+                              ('title', flask_restful.fields.String)])
+        rows = [{'id': 1, 'updated': 1, 'title': 'a'}, {'id': 2, 'updated': 1, 'title': 'b'}]
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with(fields, envelope='items', sparse=True, cache=cache)
+            def get(self):
+                return rows
+
+        api.add_resource(FooResource, '/foo')
+
+        with app.test_client() as client:
+            client.get('/foo')
+            rows[0] = {'id': 1, 'updated': 2, 'title': 'c'}
+            resp = client.get('/foo')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              {'items': [{'id': 1, 'title': 'c'}, {'id': 2, 'title': 'b'}]})
+            self.assertEquals((cache.hits, cache.misses), (1, 3))
+            resp = client.get('/foo?fields=id')
+            self.assertEquals(loads(resp.data.decode('utf-8')), {'items': [{'id': 1}, {'id': 2}]})
+            self.assertEquals(len(cache), 4)
+
+    def test_marshal_cache_encode(self):
+        from collections import namedtuple
+        Row = namedtuple('Row', 'id version name price')
+        fields = OrderedDict([('id', flask_restful.fields.Integer),
+                              ('name', flask_restful.fields.String),
+                              ('price', flask_restful.fields.Fixed(2))])
+        marshaller = flask_restful.compile_fields(fields, envelope='items')
+        cache = flask_restful.MarshalCache()
+        rows = [Row(1, 1, u'caf\xe9', 1.5), Row(2, 1, 'b', 2)]
+        expected = marshaller.encode(rows)
+        self.assertEquals(cache.encode(marshaller, rows), expected)
+        self.assertEquals(cache.encode(marshaller, rows), expected)
+        self.assertEquals((cache.hits, cache.misses), (2, 2))
+
+        rows[1] = Row(2, 2, 'c', 3)
+        self.assertEquals(cache.encode(marshaller, rows), marshaller.encode(rows))
+        self.assertEquals(cache.encode(flask_restful.compile_fields(fields), rows[:1]),
+                          flask_restful.compile_fields(fields).encode(rows[:1]))
+        self.assertEquals((cache.hits, cache.misses), (4, 3))
+
+        # Records and JSON are cached separately
+        self.assertEquals(cache.marshal(marshaller, rows), marshaller(rows))
+        self.assertEquals(len(cache), 4)
+
+    def test_marshal_with_cache_encode(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        cache = flask_restful.MarshalCache()
+        rows = [{'id': i, 'version': 1} for i in range(3)]
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with({'id': flask_restful.fields.Integer}, envelope='items',
+                                        encode=True, cache=cache)
+            def get(self):
+                return rows
+
+        api.add_resource(FooResource, '/foo')
+
+        with app.test_client() as client:
+            for _ in range(2):
+                resp = client.get('/foo')
+                self.assertEquals(loads(resp.data.decode('utf-8')),
+                                  {'items': [{'id': 0}, {'id': 1}, {'id': 2}]})
+        self.assertEquals((cache.hits, cache.misses), (3, 3))
+
+    def test_marshal_columns(self):
+        import sqlite3
+        db = sqlite3.connect(':memory:')
+        db.row_factory = sqlite3.Row
+        db.execute('create table items (id integer, title text, price real)')
+        db.executemany('insert into items values (?, ?, ?)', [(1, 'a', 1.5), (2, 'b', None)])
+        cursor = db.execute('select id, title, price from items order by id')
+        rows = cursor.fetchall()
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('cost', flask_restful.fields.Float(attribute='price', default=0.0)),
+            ('info', {'title': flask_restful.fields.String}),
+            ('static', flask_restful.fields.FormattedString('item')),
+        ])
+        expected = flask_restful.marshal([dict(row) for row in rows], fields, envelope='items')
+        self.assertEquals(flask_restful.marshal(rows, fields, envelope='items',
+                                                columns=cursor.description), expected)
+        self.assertEquals(flask_restful.marshal_many(rows, flask_restful.bind_fields(
+            fields, ['id', 'title', 'price']), envelope='items'), expected)
+
+        marshaller = flask_restful.compile_fields(fields)
+        self.assertTrue(marshaller.bind(['id', 'title', 'price']) is
+                        marshaller.bind(cursor.description))
+
+    def test_marshal_single_row(self):
+        from collections import namedtuple
+        Row = namedtuple('Row', 'id title tags')
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('title', flask_restful.fields.String),
+            ('tags', flask_restful.fields.List(flask_restful.fields.String)),
+        ])
+        expected = OrderedDict([('id', 1), ('title', 'a'), ('tags', ['x'])])
+        cache = flask_restful.MarshalCache()
+        for row in (Row(1, 'a', ('x',)), (1, 'a', ('x',))):
+            self.assertEquals(flask_restful.marshal(row, fields, columns=Row), expected)
+            self.assertEquals(flask_restful.marshal(row, fields, columns=Row, workers=2,
+                                                    cache=cache), expected)
+            marshaller = flask_restful.compile_fields(fields).bind(Row)
+            self.assertEquals(marshaller.encode(row), dumps(expected).encode('utf-8'))
+
+        # Tuples of rows, as some drivers return them, are lists
+        rows = ((1, 'a', ('x',)), (2, 'b', ()))
+        self.assertEquals(flask_restful.marshal(rows, fields, columns=Row),
+                          [expected, OrderedDict([('id', 2), ('title', 'b'), ('tags', [])])])
+
+    def test_marshal_with_columns(self):
+        from collections import namedtuple
+        Row = namedtuple('Row', 'id title')
+        fields = {'id': flask_restful.fields.Integer,
+                  'name': flask_restful.fields.String(attribute='title')}
+
+        @flask_restful.marshal_with(fields, columns=Row)
+        def get():
+            return [Row(1, 'a'), Row('2', 'b')]
+
+        self.assertEquals(get(), [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}])
+
+        @flask_restful.marshal_with(fields, columns=Row)
+        def get_one():
+            return Row(1, 'a')
+
+        self.assertEquals(get_one(), {'id': 1, 'name': 'a'})
+
+    def test_marshal_with_columns_plain_tuples(self):
+        fields = {'id': flask_restful.fields.Integer,
+                  'name': flask_restful.fields.String(attribute='title')}
+        columns = ('id', 'title')
+
+        # A plain row comes wrapped, so that it is not taken for a status code
+        @flask_restful.marshal_with(fields, columns=columns)
+        def get_one():
+            return (1, 'a'),
+
+        self.assertEquals(get_one(), ({'id': 1, 'name': 'a'}, 200, {}))
+
+        @flask_restful.marshal_with(fields, columns=columns)
+        def post():
+            return (1, 'a'), 201, {'X-Id': '1'}
+
+        self.assertEquals(post(), ({'id': 1, 'name': 'a'}, 201, {'X-Id': '1'}))
+
+        @flask_restful.marshal_with(fields, columns=columns)
+        def get_all():
+            return ((1, 'a'), (2, 'b')), 200
+
+        self.assertEquals(get_all(), ([{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}], 200, {}))
+
+        @flask_restful.marshal_with(fields, columns=columns)
+        def get_bare():
+            return 1, 'a'
+
+        self.assertRaises(TypeError, get_bare)
+
+        @flask_restful.marshal_with(fields, columns=('id', 'title', 'body', 'author'))
+        def get_long():
+            return 1, 'a', 'b', 'c'
+
+        self.assertRaises(TypeError, get_long)
+
+    def test_marshal_parallel(self):
+        app = Flask(__name__)
+        app.add_url_rule('/items/<int:id>', 'item', view_func=lambda id: '')
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('uri', flask_restful.fields.Url('item')),
+            ('price', flask_restful.fields.Fixed(2)),
+        ])
+        data = [{'id': i, 'price': i / 4.0} for i in range(2500)]
+        with app.test_request_context('/'):
+            serial = flask_restful.marshal(data, fields, envelope='items')
+            parallel = flask_restful.marshal(data, fields, envelope='items', workers=3)
+        self.assertEquals(serial, parallel)
+        self.assertEquals(parallel['items'][1234]['uri'], '/items/1234')
+
+    def test_marshal_parallel_processes(self):
+        from multiprocessing import Pool
+        fields = {'id': flask_restful.fields.Integer,
+                  'author': flask_restful.fields.Nested({'name': flask_restful.fields.String})}
+        data = [{'id': i, 'author': {'name': i}} for i in range(1200)]
+        marshaller = flask_restful.compile_fields(fields)
+        marshaller({'id': 1, 'author': {}})
+        pool = Pool(2)
+        try:
+            output = marshaller.parallel(data, pool)
+        finally:
+            pool.close()
+        self.assertEquals(output, flask_restful.marshal(data, fields))
+
+    def test_pickle_used_fields(self):
+        import pickle
+        from datetime import datetime
+
+        class Item(object):
+            def __init__(self, id):
+                self.id = id
+                self.tags = ['a', 'b']
+                self.created = datetime(2015, 1, 1)
+                self.owner = {'name': 'bob'}
+
+        app = Flask(__name__)
+        app.add_url_rule('/items/<int:id>', 'item', view_func=lambda id: '')
+        fields = OrderedDict([
+            ('id', flask_restful.fields.Integer),
+            ('tags', flask_restful.fields.List(flask_restful.fields.String)),
+            ('uri', flask_restful.fields.Url('item')),
+            ('created', flask_restful.fields.DateTime),
+            ('owner', flask_restful.fields.Nested({'name': flask_restful.fields.String})),
+            ('ref', flask_restful.fields.Raw(attribute='id', loader=flask_restful.fields.Loader(list))),
+        ])
+        marshaller = flask_restful.compile_fields(fields)
+        with app.test_request_context('/'):
+            expected = marshaller([Item(1), Item(2)])
+            copy = pickle.loads(pickle.dumps(marshaller))
+            self.assertEquals(copy([Item(1), Item(2)]), expected)
+
+    def test_marshal_with_parallel(self):
+        fields = {'id': flask_restful.fields.Integer}
+        data = [{'id': i} for i in range(1500)]
+        decorator = flask_restful.marshal_with(fields, envelope='items', parallel=2)
+        with patch.object(flask_restful.Marshaller, 'parallel',
+                          wraps=decorator.marshaller.parallel) as parallel:
+            output = decorator(lambda: data)()
+        self.assertEquals(output, {'items': data})
+        self.assertTrue(parallel.called)
+
+    def test_marshal_parallel_without_context_copy(self):
+        from multiprocessing.pool import ThreadPool
+        app = Flask(__name__)
+        marshaller = flask_restful.compile_fields({'id': flask_restful.fields.Raw})
+        data = [{'id': i} for i in range(1500)]
+        pool = ThreadPool(2)
+        try:
+            with app.test_request_context('/'):
+                with patch('flask_restful._request_ctx_stack', Mock(top=object())):
+                    with patch.object(pool, 'map') as map:
+                        output = marshaller.parallel(data, pool)
+        finally:
+            pool.close()
+        self.assertEquals(output, data)
+        self.assertFalse(map.called)
+
+    def test_marshal_parallel_below_threshold(self):
+        pool = Mock()
+        output = flask_restful.compile_fields({'id': flask_restful.fields.Raw}).parallel([{'id': 1}], pool)
+        self.assertEquals(output, [{'id': 1}])
+        self.assertFalse(pool.map.called)
+
     def test_api_representation(self):
         app = Mock()
         api = flask_restful.Api(app)
@@ -829,6 +1645,120 @@ class APITestCase(unittest.TestCase):
         self.assertEquals(resp.status_code, 200)
         self.assertEquals(resp.data.decode('utf-8'), '{"foo": 3.0}')
 
+    def test_marshal_iter_streams_json(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+        fetched = []
+
+        def rows():
+            for i in range(3):
+                fetched.append(i)
+                yield {'foo': i, 'bar': 'baz'}
+
+        class FooResource(flask_restful.Resource):
+            fields = {'foo': flask_restful.fields.Integer}
+
+            def get(self):
+                return flask_restful.marshal_iter(rows(), self.fields)
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(fetched, [])
+            self.assertEquals(resp.status_code, 200)
+            self.assertEquals(resp.content_type, 'application/json')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              [{'foo': 0}, {'foo': 1}, {'foo': 2}])
+            self.assertEquals(fetched, [0, 1, 2])
+
+    def test_marshal_iter_streams_json_with_envelope(self):
+        app = Flask(__name__)
+        app.config['DEBUG'] = True
+        api = flask_restful.Api(app)
+
+        class FooResource(flask_restful.Resource):
+            fields = {'foo': flask_restful.fields.Integer}
+
+            def get(self):
+                data = iter([{'foo': 1}, {'foo': 2}])
+                return flask_restful.marshal_iter(data, self.fields, envelope='items')
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(loads(resp.data.decode('utf-8')),
+                              {'items': [{'foo': 1}, {'foo': 2}]})
+            self.assertTrue(resp.data.endswith(b'\n'))
+
+    def test_marshal_iter_without_stream_with_context(self):
+        from flask_restful.representations import json as json_rep
+        app = Flask(__name__)
+        app.add_url_rule('/items/<int:id>', 'item', view_func=lambda id: '')
+        fields = {'uri': flask_restful.fields.Url('item')}
+        with app.test_request_context('/'):
+            with patch.object(json_rep, 'stream_with_context', None):
+                resp = json_rep.output_json(flask_restful.marshal_iter(iter([{'id': 1}]), fields),
+                                            200)
+        self.assertFalse(resp.is_streamed)
+        self.assertEquals(loads(resp.data.decode('utf-8')), [{'uri': '/items/1'}])
+
+    def test_iter_json_chunks(self):
+        from flask.ext.restful.representations import json as json_rep
+        data = ({'foo': i} for i in range(1000))
+        with patch.object(json_rep, 'STREAM_CHUNK_SIZE', 100):
+            chunks = list(json_rep.iter_json(data))
+        self.assertTrue(len(chunks) > 1)
+        self.assertEquals(loads(''.join(chunks)), [{'foo': i} for i in range(1000)])
+
+    def test_marshaller_encode(self):
+        fields = OrderedDict([
+            ('foo', flask_restful.fields.String),
+            ('num', flask_restful.fields.Integer),
+            ('flt', flask_restful.fields.Float),
+            ('ok', flask_restful.fields.Boolean),
+            ('fee', flask_restful.fields.Nested({
+                'fye': flask_restful.fields.String,
+            }, allow_null=True)),
+            ('tags', flask_restful.fields.List(flask_restful.fields.String)),
+            ('bar', OrderedDict([('a', flask_restful.fields.Raw)])),
+        ])
+        data = [
+            {'foo': u'caf\xe9 "quoted"', 'num': '1', 'flt': float('inf'), 'ok': 1,
+             'fee': {'fye': 'fum'}, 'tags': ['a'], 'a': {'x': [1]}},
+            {'foo': None, 'num': None, 'flt': 0.1, 'ok': '', 'fee': None},
+        ]
+        marshaller = flask_restful.compile_fields(fields, envelope='items')
+        self.assertEquals(marshaller.encode(data),
+                          dumps(marshaller(data)).encode('utf-8'))
+
+    def test_marshaller_encode_settings(self):
+        from flask.ext.restful.representations import json as json_rep
+        fields = OrderedDict([('b', flask_restful.fields.String),
+                              ('a', flask_restful.fields.Integer)])
+        marshaller = flask_restful.compile_fields(fields)
+        with patch.object(json_rep, 'settings', {'sort_keys': True, 'separators': (',', ':')}):
+            self.assertEquals(marshaller.encode({'a': 1, 'b': 'x'}), b'{"a":1,"b":"x"}')
+        self.assertEquals(marshaller.encode({'a': 1, 'b': 'x'}), b'{"b": "x", "a": 1}')
+
+    def test_marshal_with_encode(self):
+        app = Flask(__name__)
+        api = flask_restful.Api(app)
+
+        class FooResource(flask_restful.Resource):
+            @flask_restful.marshal_with({'foo': flask_restful.fields.Integer}, encode=True)
+            def get(self):
+                return [{'foo': '1'}, {'foo': 2}], 201
+
+        api.add_resource(FooResource, '/api')
+
+        with app.test_client() as client:
+            resp = client.get('/api')
+            self.assertEquals(resp.status_code, 201)
+            self.assertEquals(resp.content_type, 'application/json')
+            self.assertEquals(resp.data, b'[{"foo": 1}, {"foo": 2}]')
+
     def test_custom_error_message(self):
         errors = {
             'FooError': {
@@ -1,11 +1,15 @@
 from decimal import Decimal
 import unittest
-from mock import Mock
+from mock import Mock, patch
 from flask.ext.restful.fields import MarshallingException
 from flask.ext.restful.utils import OrderedDict
 from flask_restful import fields
 from datetime import datetime, timedelta, tzinfo
 from flask import Flask, Blueprint
+try:
+    import numpy
+except ImportError:
+    numpy = None
 #noinspection PyUnresolvedReferences
 from nose.tools import assert_equals  # you need it for tests in form of continuations
 
@@ -129,6 +133,28 @@ class FieldsTestCase(unittest.TestCase):
         field = fields.FormattedString("{hey}")
         self.assertEquals("3", field.output("hey", Foo()))
 
+    def test_formatted_string_names(self):
+        field = fields.FormattedString("{hey.real:>{width}}|{hey!r}")
+        self.assertEquals(sorted(name for name, _ in field.names), ['hey', 'width'])
+        self.assertEquals("  3|3", field.output("foo", {'hey': 3, 'width': 3, 'other': 1}))
+
+    def test_formatted_string_missing_name(self):
+        field = fields.FormattedString("{hey} {missing}")
+        self.assertRaises(KeyError, lambda: field.output("foo", Foo()))
+        self.assertRaises(KeyError, lambda: field.output("foo", {'hey': 3}))
+
+    def test_formatted_string_not_a_mapping(self):
+        field = fields.FormattedString("{hey}")
+        self.assertRaises(MarshallingException, lambda: field.output("foo", (3, 4)))
+
+    def test_formatted_string_marshallable(self):
+        class Marshallable(object):
+            def __marshallable__(self):
+                return {'hey': 'there'}
+
+        field = fields.FormattedString("{hey}")
+        self.assertEquals("there", field.output("foo", Marshallable()))
+
     def test_string_with_attribute(self):
         field = fields.String(attribute="hey")
         self.assertEquals("3", field.output("foo", Foo()))
@@ -242,6 +268,61 @@ class FieldsTestCase(unittest.TestCase):
         with app.test_request_context("/foo/hey", base_url="http://localhost"):
             self.assertEquals("https://localhost/foo/3", field.output("hey", Foo()))
 
+    def test_url_matches_url_for(self):
+        from flask import url_for
+        try:
+            from urlparse import urlparse
+        except ImportError:
+            from urllib.parse import urlparse
+        app = Flask(__name__)
+        app.config['SERVER_NAME'] = 'example.com'
+        view = lambda **kwargs: ''
+        app.add_url_rule("/items/", "items", view_func=view, defaults={'page': 1})
+        app.add_url_rule("/items/page/<int:page>", "items", view_func=view)
+        app.add_url_rule("/<user>/<path:name>", "file", view_func=view, subdomain='files')
+        cases = [
+            ("items", {'page': 1}),
+            ("items", {'page': 3, 'extra': 'ignored'}),
+            ("items", {'page': None}),
+            ("file", {'user': 'bob', 'name': 'a b/c', 'page': 2}),
+        ]
+
+        with app.test_request_context("/", base_url="http://example.com/app"):
+            for endpoint, data in cases:
+                for absolute in (False, True):
+                    field = fields.Url(endpoint, absolute=absolute)
+                    o = urlparse(url_for(endpoint, _external=True, **data))
+                    expected = (o.scheme + '://' + o.netloc if absolute else '') + o.path
+                    self.assertEquals(expected, field.output("uri", data))
+
+    def test_url_with_defaults_function(self):
+        app = Flask(__name__)
+        app.add_url_rule("/<lang>/<hey>", "foobar", view_func=lambda **kwargs: '')
+        app.url_defaults(lambda endpoint, values: values.setdefault('lang', 'en'))
+        field = fields.Url("foobar")
+
+        with app.test_request_context("/"):
+            self.assertEquals("/en/3", field.output("hey", Foo()))
+
+    def test_url_recompiled_per_request(self):
+        app = Flask(__name__)
+        app.add_url_rule("/<hey>", "foobar", view_func=lambda x: x)
+        field = fields.Url("foobar", absolute=True)
+
+        with app.test_request_context("/", base_url="http://localhost"):
+            self.assertEquals("http://localhost/3", field.output("hey", Foo()))
+        with app.test_request_context("/", base_url="https://example.com/app"):
+            self.assertEquals("https://example.com/app/3", field.output("hey", Foo()))
+
+    def test_url_missing_value(self):
+        from werkzeug.routing import BuildError
+        app = Flask(__name__)
+        app.add_url_rule("/<hey>", "foobar", view_func=lambda x: x)
+        field = fields.Url("foobar")
+
+        with app.test_request_context("/"):
+            self.assertRaises(BuildError, lambda: field.output("hey", {'hey': None}))
+
     def test_int(self):
         field = fields.Integer()
         self.assertEquals(3, field.output("hey", {'hey': 3}))
@@ -296,6 +377,22 @@ class FieldsTestCase(unittest.TestCase):
         field = fields.Fixed()
         self.assertRaises(MarshallingException, lambda: field.output("hey", {'hey': 'NaN'}))
 
+    def test_fixed_fast_paths(self):
+        field = fields.Fixed(2)
+        self.assertEquals('2.50', field.format(2.5))
+        self.assertEquals('0.12', field.format(0.125))
+        self.assertEquals('2.67', field.format(2.675))  # 2.67499999...
+        self.assertEquals('-0.00', field.format(-0.001))
+        self.assertEquals('-12.00', field.format(-12))
+        self.assertRaises(MarshallingException, lambda: field.format(float('nan')))
+        self.assertRaises(MarshallingException, lambda: field.format(float('-inf')))
+        self.assertEquals('0E-8', fields.Fixed(8).format(0))
+
+    def test_fixed_column(self):
+        field = fields.Fixed(2, default=0)
+        self.assertEquals(['1.00', 0, '2.67'], field.output_many('hey', [
+            {'hey': 1}, {'hey': None}, {'hey': 2.675}]))
+
     def test_fixed_with_attribute(self):
         field = fields.Fixed(4, attribute="bar")
         self.assertEquals('3.0000', field.output("foo", {'bar': '3'}))
@@ -332,6 +429,28 @@ class FieldsTestCase(unittest.TestCase):
         field = fields.DateTime(dt_format='iso8601')
         self.assertEquals("2011-08-22T18:58:45+00:00", field.output("bar", obj))
 
+    def test_date_field_repeated_seconds(self):
+        field = fields.DateTime(dt_format='iso8601')
+        outputs = [field.format(datetime(2011, 8, 22, 20, 58, 45, ms)) for ms in (0, 500000)]
+        outputs.append(field.format(datetime(2011, 8, 22, 20, 58, 46, tzinfo=TZ())))
+        self.assertEquals(["2011-08-22T20:58:45+00:00"] * 2 + ["2011-08-22T18:58:46+00:00"], outputs)
+
+    def test_date_field_column(self):
+        field = fields.DateTime(default='never')
+        rows = [{'bar': datetime(2011, 8, 22, 20, 58, 45)}, {'bar': None},
+                {'bar': datetime(1969, 12, 31, 23, 59, 59, 1, tzinfo=TZ())}]
+        self.assertEquals([field.output('bar', row) for row in rows],
+                          field.output_many('bar', rows))
+        self.assertRaises(MarshallingException, lambda: field.output_many('bar', [{'bar': 3}]))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_date_field_datetime64_column(self):
+        values = numpy.array(['2011-08-22T20:58:45.75', 'NaT', '1969-12-31T23:59:59.5',
+                              '2011-08-22T20:58:45'], dtype='datetime64[ms]')
+        field = fields.DateTime(dt_format='iso8601')
+        self.assertEquals(["2011-08-22T20:58:45+00:00", None, "1969-12-31T23:59:59+00:00",
+                           "2011-08-22T20:58:45+00:00"], field.format_column(values))
+
     def test_unsupported_datetime_format(self):
         obj = {"bar": datetime(2011, 8, 22, 20, 58, 45)}
         field = fields.DateTime(dt_format='raw')
@@ -358,6 +477,85 @@ class FieldsTestCase(unittest.TestCase):
     def test_get_value_obj(self):
         self.assertEquals(3, fields.get_value("hey", Foo()))
 
+    def test_get_value_dotted(self):
+        obj = Mock()
+        obj.author = {'profile': Foo()}
+        self.assertEquals(3, fields.get_value("author.profile.hey", obj))
+        self.assertEquals(None, fields.get_value("author.nope.hey", obj))
+
+    def test_get_value_index(self):
+        self.assertEquals('b', fields.get_value(1, ['a', 'b']))
+
+    def test_accessor_is_shared(self):
+        self.assertTrue(fields.get_accessor('hey') is fields.get_accessor('hey'))
+
+    def test_accessors_are_bounded(self):
+        self.assertTrue(fields.get_accessor(0) is not fields.get_accessor(0))
+        for i in range(2000):
+            fields.get_accessor('key%d' % i)
+        self.assertTrue(len(fields._accessors) <= fields._accessors.maxsize)
+
+    def test_compiled_accessors_resolved_once(self):
+        from flask_restful import compile_fields
+        marshaller = compile_fields({'a': fields.Integer, 'b': fields.List(fields.String),
+                                     'c': fields.Nested({'d': fields.Raw})})
+        data = [{'a': 1, 'b': ['x'], 'c': {'d': 2}}] * 3
+        self.assertEquals(marshaller(data), data)
+        with patch('flask_restful.fields.get_accessor', side_effect=fields.get_accessor) as lookup:
+            self.assertEquals(marshaller(data), data)
+        self.assertFalse(lookup.called)
+
+    def test_accessor_mixed_types(self):
+        accessor = fields.Accessor('a.b')
+        holder = Foo()
+        holder.b = 'attr'
+        self.assertEquals(1, accessor({'a': {'b': 1}}))
+        self.assertEquals('attr', accessor({'a': holder}))
+        self.assertEquals(2, accessor(OrderedDict([('a', [0, 1])]), 2))
+        self.assertEquals(None, accessor({'a': 'string'}))
+
+    def test_accessor_function(self):
+        accessor = fields.Accessor(lambda obj: obj.hey * 2)
+        self.assertEquals(6, accessor(Foo()))
+
+    def test_attribute_resolved_once(self):
+        field = fields.String(attribute='hey')
+        self.assertTrue(field.accessor('foo') is field.accessor('bar'))
+        field.attribute = 'bar'
+        self.assertEquals('4', field.output('foo', {'bar': 4, 'hey': 3}))
+
+    def test_format_column(self):
+        field = fields.String(default='nope')
+        self.assertEquals(['1', 'nope', 'a'], field.format_column([1, None, 'a']))
+
+    def test_output_many(self):
+        field = fields.Integer(attribute='hey')
+        self.assertEquals([3, 0, 4], field.output_many('foo', [Foo(), {}, {'hey': '4'}]))
+
+    def test_output_many_overridden_output(self):
+        field = fields.FormattedString("{hey}")
+        self.assertEquals(['3', '3'], field.output_many('foo', [Foo(), Foo()]))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_fixed_array_column(self):
+        field = fields.Fixed(2)
+        self.assertEquals(['0.12', '-2.67'], field.format_column(numpy.array([0.125, -2.675])))
+        self.assertEquals(['0E-8'], fields.Fixed(8).format_column(numpy.array([0])))
+        self.assertRaises(MarshallingException, lambda: field.format_column(numpy.array([1.0, numpy.nan])))
+        self.assertEquals(['7', '-1'], fields.Arbitrary().format_column(numpy.array([7, -1])))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_output_many_structured_array(self):
+        rows = numpy.array([(1, 0.5, True), (2, 1.5, False)],
+                           dtype=[('a', 'i8'), ('b', 'f8'), ('c', '?')])
+        self.assertEquals([1, 2], fields.Integer().output_many('a', rows))
+        self.assertEquals([0.5, 1.5], fields.Float().output_many('b', rows))
+        self.assertEquals([1, 0], fields.Integer().output_many('c', rows))
+        self.assertEquals(['1.00', '2.00'], fields.Fixed(2).output_many('a', rows))
+        self.assertEquals(['0.50', '1.50'], fields.Fixed(2).output_many('b', rows))
+        self.assertEquals([1, 2], fields.Raw().output_many('a', rows))
+        self.assertTrue(all(type(value) is int for value in fields.Raw().output_many('a', rows)))
+
     def test_list(self):
         obj = {'list': ['a', 'b', 'c']}
         field = fields.List(fields.String)
@@ -419,6 +617,124 @@ class FieldsTestCase(unittest.TestCase):
         self.assertEquals([OrderedDict([('a', 1)]), OrderedDict([('a', 2)]), OrderedDict([('a', 3)])],
                           field.output('list', obj))
 
+    def test_list_items(self):
+        field = fields.List(fields.Integer(default=-1))
+        self.assertEquals([1, -1, 3], field.output('list', {'list': ['1', None, 3]}))
+        # Fields other than Raw and Nested look dict items up by index
+        self.assertEquals([5, 7], field.output('list', {'list': [{0: '5'}, {0: 'x', 1: 7}]}))
+
+        field = fields.List(fields.Nested({'a': fields.Integer}, allow_null=True))
+        self.assertEquals([{'a': 1}, None, {'a': 2}],
+                          field.output('list', {'list': [{'a': 1}, None, {'a': 2}]}))
+
+        field = fields.List(fields.List(fields.String))
+        self.assertEquals([['a', 'b'], ['1']], field.output('list', {'list': [('a', 'b'), [1]]}))
+
+    def test_list_items_formatter(self):
+        field = fields.List(fields.String)
+        self.assertTrue(field._items_formatter() is field._items_formatter())
+        self.assertEquals([u'1', u'2'], field.format([1, 2]))
+        field.container = fields.Integer()
+        self.assertEquals([1, 2], field.format(['1', '2']))
+
+    def test_bind(self):
+        columns = {'id': 0, 'author': 1, 'author_id': 2}
+        row = (5, {'name': 'bob'}, 7)
+        self.assertEquals(5, fields.Integer().bind('id', columns).output('id', row))
+        self.assertEquals('bob', fields.String(attribute='author.name').bind('name', columns)
+                          .output('name', row))
+        field = fields.String()
+        self.assertTrue(field.bind('title', columns) is field)
+
+        field = fields.Nested({'name': fields.String}, expand_only=True,
+                              reference=fields.Integer(attribute='author_id')).bind('author', columns)
+        self.assertEquals(7, field.output('author', row))
+        self.assertEquals([7, 7], field.output_many('author', [row, row]))
+        self.assertEquals({'name': 'bob'}, field.expand(None).output('author', row))
+
+    def test_nested_expand_only(self):
+        class Post(object):
+            author_id = 7
+
+            @property
+            def author(self):
+                raise AssertionError('the author should not be loaded')
+
+        field = fields.Nested({'name': fields.String}, expand_only=True,
+                              reference=fields.Integer(attribute='author_id'))
+        self.assertEquals(7, field.output('author', Post()))
+        self.assertEquals([7, 7], field.output_many('author', [Post(), Post()]))
+        self.assertEquals(None, fields.Nested({}, expand_only=True).output('author', Post()))
+
+        expanded = field.expand(None)
+        self.assertTrue(field.expand_only)
+        self.assertEquals({'name': 'bob'}, expanded.output('author', {'author': {'name': 'bob'}}))
+
+    def test_loader(self):
+        calls = []
+
+        def batch(keys):
+            calls.append(keys)
+            return dict((key, key * 10) for key in keys if key != 3)
+
+        loader = fields.Loader(batch)
+        self.assertEquals([10, None, 20, 10, None], loader.load_many([1, None, 2, 1, 3]))
+        self.assertEquals([[1, 2, 3]], calls)
+        self.assertEquals(40, fields.Loader(lambda keys: [k * 10 for k in keys]).load(4))
+
+        loader.prime({5: 'primed'})
+        self.assertEquals(['primed', 60], loader.load_many([5, 6]))
+        self.assertEquals([6], calls[-1])
+        loader.prime(None)
+
+    def test_field_with_loader(self):
+        calls = []
+
+        def batch(keys):
+            calls.append(keys)
+            return [{'name': 'user %d' % key} for key in keys]
+
+        loader = fields.Loader(batch)
+        field = fields.Nested({'name': fields.String}, attribute='author_id', loader=loader)
+        rows = [{'author_id': 1}, {'author_id': 2}, {'author_id': 1}, {'author_id': None}]
+        self.assertEquals({'name': 'user 1'}, field.output('author', rows[0]))
+        self.assertEquals([{'name': 'user 1'}, {'name': 'user 2'}, {'name': 'user 1'},
+                           {'name': None}], field.output_many('author', rows))
+        self.assertEquals([[1], [1, 2]], calls)
+
+    def test_field_without_super_init(self):
+        from flask_restful import marshal, marshal_many, compile_fields
+
+        class Custom(fields.Raw):
+            def __init__(self):
+                self.attribute = None
+                self.default = None
+
+            def format(self, value):
+                return value * 2
+
+        class CustomNested(fields.Nested):
+            def __init__(self, nested):
+                self.nested = nested
+                self.allow_null = False
+                self.attribute = None
+                self.default = None
+
+        class CustomFixed(fields.Fixed):
+            def __init__(self):
+                self.attribute = None
+                self.default = None
+                self.precision = Decimal('0.1')
+
+        data = {'a': 2, 'b': [1, 2], 'c': {'d': 3}, 'e': 1.25}
+        schema = {'a': Custom(), 'b': fields.List(Custom()), 'c': CustomNested({'d': Custom()}),
+                  'e': CustomFixed()}
+        expected = {'a': 4, 'b': [2, 4], 'c': {'d': 6}, 'e': '1.2'}
+        self.assertEquals(marshal(data, schema), expected)
+        self.assertEquals(marshal_many([data], schema), [expected])
+        self.assertEquals(compile_fields(schema).encode(data),
+                          b'{"a": 4, "b": [2, 4], "c": {"d": 6}, "e": "1.2"}')
+
     def test_nested_with_default(self):
         obj = None
         field = fields.Nested({'a': fields.Integer, 'b': fields.String}, default={})
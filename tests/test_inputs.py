@@ -67,6 +67,19 @@ def test_iso8601_datetime_formatters():
         yield assert_equal, inputs.iso8601(date_obj), expected
 
 
+def test_timestamp_formatters():
+    dates = [
+        (datetime(1969, 12, 31, 23, 59, 59, 999999), -1,
+         "Wed, 31 Dec 1969 23:59:59 -0000", "1969-12-31T23:59:59+00:00"),
+        (datetime(2000, 2, 29, 12, 30, 15, tzinfo=CET()), 951823815,
+         "Tue, 29 Feb 2000 11:30:15 -0000", "2000-02-29T11:30:15+00:00"),
+    ]
+    for date_obj, seconds, rfc, iso in dates:
+        yield assert_equal, inputs.timestamp(date_obj), seconds
+        yield assert_equal, inputs.rfc822_from_timestamp(seconds), rfc
+        yield assert_equal, inputs.iso8601_from_timestamp(seconds), iso
+
+
 def test_reverse_rfc822_datetime():
     dates = [
         ("Sat, 01 Jan 2011 00:00:00 -0000", datetime(2011, 1, 1, tzinfo=UTC())),
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 import unittest
+from functools import partial
 from mock import Mock, patch, NonCallableMock
 from flask import Flask
 from werkzeug import exceptions, MultiDict
 from werkzeug.wrappers import Request
 from werkzeug.datastructures import FileStorage
+import flask_restful
 from flask_restful.reqparse import Argument, RequestParser, Namespace
 import six
 import decimal
@@ -476,6 +478,33 @@ class ReqParseTestCase(unittest.TestCase):
         args = parser.parse_args(req)
         self.assertEquals('bat', args.get('foo'))
 
+    def test_parse_choices_insensitive_unchanged(self):
+        parser = RequestParser()
+        parser.add_argument("foo", choices=("BAT", "Bar"), case_sensitive=False)
+
+        args = parser.parse_args(Request.from_values("/bubble?foo=bar"))
+        self.assertEquals('bar', args.get('foo'))
+        self.assertEquals(parser.args[0].choices, ("BAT", "Bar"))
+
+        parser.args[0].case_sensitive = True
+        self.assertRaises(exceptions.BadRequest,
+                          lambda: parser.parse_args(Request.from_values("/bubble?foo=bar")))
+
+    def test_parse_choices_containers(self):
+        parser = RequestParser()
+        parser.add_argument("foo", type=int, choices=range(5))
+        parser.add_argument("bar", type=lambda value: [value], choices=[["a"]])
+
+        args = parser.parse_args(Request.from_values("/bubble?foo=3&bar=a"))
+        self.assertEquals(args, {'foo': 3, 'bar': ["a"]})
+        self.assertRaises(exceptions.BadRequest,
+                          lambda: parser.parse_args(Request.from_values("/bubble?foo=5")))
+
+        parser = RequestParser()
+        parser.add_argument("foo", type=lambda value: [value], choices=["a"])
+        self.assertRaises(exceptions.BadRequest,
+                          lambda: parser.parse_args(Request.from_values("/bubble?foo=a")))
+
     def test_parse_ignore(self):
         req = Request.from_values("/bubble?foo=bar")
 
@@ -542,6 +571,54 @@ class ReqParseTestCase(unittest.TestCase):
             except exceptions.BadRequest:
                 self.fail()
 
+    def test_type_signature(self):
+        class Converter(object):
+            def __init__(self, value, name):
+                self.args = (value, name)
+
+        req = Request.from_values("/bubble?foo<=1")
+        for converter, expected in [
+            (lambda value, name: (value, name), ("1", "foo")),
+            (lambda value, name, op: (value, name, op), ("1", "foo", "<=")),
+            (lambda *args: args, ("1", "foo", "<=")),
+            (partial(lambda low, value, name: (low, value, name), 0), (0, "1", "foo")),
+            (lambda value, name=None: (value, name), ("1", "foo")),
+        ]:
+            parser = RequestParser()
+            parser.add_argument("foo", type=converter, operators=["<="])
+            self.assertEquals(parser.parse_args(req)['foo'], expected)
+
+        parser = RequestParser()
+        parser.add_argument("foo", type=Converter, operators=["<="])
+        self.assertEquals(parser.parse_args(req)['foo'].args, ("1", "foo"))
+
+        class NewConverter(str):
+            def __new__(cls, value, name):
+                return str.__new__(cls, name + value)
+
+        parser = RequestParser()
+        parser.add_argument("foo", type=NewConverter, operators=["<="])
+        self.assertEquals(parser.parse_args(req)['foo'], "foo1")
+
+    def test_type_reassigned(self):
+        arg = Argument("foo", type=int)
+        arg.type = lambda value, name: name
+        self.assertEquals(arg.convert("1", "="), "foo")
+
+    @patch('flask_restful.abort')
+    def test_type_error_not_retried(self, abort):
+        calls = []
+
+        def converter(value, name, op):
+            calls.append(value)
+            raise TypeError("Not a foo")
+
+        parser = RequestParser()
+        parser.add_argument("foo", type=converter)
+        parser.parse_args(Request.from_values("/bubble?foo=1"))
+        abort.assert_called_with(400, message="Not a foo")
+        self.assertEquals(calls, ["1"])
+
     def test_type_decimal(self):
         app = Flask(__name__)
 
@@ -679,6 +756,150 @@ class ReqParseTestCase(unittest.TestCase):
         args = parser.parse_args(req)
         self.assertEquals(args, {})
 
+    def test_parse_shares_sources(self):
+        pulls = []
+
+        class CountingRequest(Request):
+            @property
+            def values(self):
+                pulls.append('values')
+                return super(CountingRequest, self).values
+
+        req = CountingRequest.from_values("/bubble?foo=1&bar=2&baz=3")
+        parser = RequestParser()
+        parser.add_argument('foo', type=int)
+        parser.add_argument('bar', type=int)
+        parser.add_argument('baz', location='args')
+        parser.add_argument('qux', location=['json', 'values'])
+        args = parser.parse_args(req, strict=True)
+        self.assertEquals(args, {'foo': 1, 'bar': 2, 'baz': '3', 'qux': None})
+        self.assertEquals(pulls, ['values'])
+        self.assertEquals(req.argument_sources, None)
+
+        # Outside of parse_args, every argument pulls its own values
+        Argument('foo').parse(req)
+        self.assertEquals(pulls, ['values', 'values'])
+
+    def test_compile(self):
+        parser = RequestParser()
+        parser.add_argument('foo', type=int, operators=['=', '<='],
+                            action='append')
+        parser.add_argument('bar', choices=['One', 'two'], case_sensitive=False)
+        parser.add_argument('baz', default=lambda: 'called')
+        parser.add_argument('qux', location='json', store_missing=False)
+        parser.add_argument('quux', type=int, ignore=True, dest='corge')
+        parse = parser.compile()
+
+        for url in ["/bubble?foo=1&foo<=2&bar=ONE&quux=x",
+                    "/bubble?foo=3&bar=Two&baz=4&quux=5"]:
+            req = Request.from_values(url)
+            self.assertEquals(parse(req), parser.parse_args(req))
+
+        req = Request.from_values("/bubble?foo=1&bar=one")
+        self.assertEquals(parse(req), {'foo': [1], 'bar': 'one',
+                                       'baz': 'called', 'corge': None})
+        self.assertEquals(req.argument_sources, None)
+
+    def test_compile_errors(self):
+        parser = RequestParser()
+        parser.add_argument('foo', type=int, required=True)
+        parser.add_argument('bar', choices=['one'], help='Bad bar')
+        parse = parser.compile()
+
+        for url in ["/bubble", "/bubble?foo=x", "/bubble?foo=1&bar=two"]:
+            messages = []
+            with patch('flask_restful.abort') as abort:
+                abort.side_effect = exceptions.BadRequest
+                for fn in (parse, parser.parse_args):
+                    self.assertRaises(exceptions.BadRequest, fn,
+                                      Request.from_values(url))
+                    messages.append(abort.call_args)
+            self.assertEquals(messages[0], messages[1])
+
+        req = Request.from_values("/bubble?foo=1&baz=2")
+        self.assertEquals(parse(req), {'foo': 1, 'bar': None})
+        self.assertRaises(exceptions.BadRequest, parse, req, strict=True)
+
+    def test_compile_custom_argument(self):
+        class ReversedArgument(Argument):
+            def parse(self, request):
+                value, found = super(ReversedArgument, self).parse(request)
+                return value[::-1], found
+
+        parser = RequestParser(argument_class=ReversedArgument)
+        parser.add_argument('foo')
+        parse = parser.compile()
+        req = Request.from_values("/bubble?foo=bar")
+        self.assertEquals(parse(req), {'foo': 'rab'})
+
+    def test_parse_many(self):
+        parser = RequestParser()
+        parser.add_argument('name', required=True)
+        parser.add_argument('age', type=int, dest='years')
+        parser.add_argument('kind', choices=['a', 'b'], case_sensitive=False)
+        parser.add_argument('tag', action='append', default=list)
+
+        items = [{'name': 'foo', 'age': '3', 'kind': 'A'},
+                 {'name': 'bar', 'tag': 'x'}]
+        self.assertEquals(parser.parse_many(items), [
+            {'name': 'foo', 'years': 3, 'kind': 'a', 'tag': []},
+            {'name': 'bar', 'years': None, 'kind': None, 'tag': ['x']},
+        ])
+        self.assertEquals(parser.parse_many([]), [])
+
+    @patch('flask_restful.abort')
+    def test_parse_many_errors(self, abort):
+        parser = RequestParser()
+        parser.add_argument('name', required=True)
+        parser.add_argument('age', type=int, help='Bad age')
+        parser.add_argument('kind', choices=['a', 'b'])
+        parser.add_argument('size', type=int, ignore=True)
+
+        parser.parse_many([{'name': 'foo', 'age': '1', 'size': 'x'},
+                           {'age': 'x', 'kind': 'c'},
+                           'foo',
+                           {'name': 'bar', 'age': '2', 'kind': 'a'}])
+        abort.assert_called_with(400, message={
+            1: {'name': 'Missing required parameter name', 'age': 'Bad age',
+                'kind': 'c is not a valid choice'},
+            2: 'Expected an object',
+        })
+
+        abort.side_effect = exceptions.BadRequest
+        self.assertRaises(exceptions.BadRequest, parser.parse_many, {'name': 'foo'})
+        abort.assert_called_with(400, message='Expected a list of objects')
+
+    def test_parse_many_custom_argument(self):
+        class ReversedArgument(Argument):
+            def parse(self, request):
+                value, found = super(ReversedArgument, self).parse(request)
+                if isinstance(value, six.string_types):
+                    value = value[::-1]
+                return value, found
+
+        parser = RequestParser(argument_class=ReversedArgument)
+        parser.add_argument('foo', location=['json', 'values'])
+        parser.add_argument('bar', type=int, required=True, help='Bad bar')
+        self.assertEquals(parser.parse_many([{'foo': 'ab', 'bar': '1'}, {'bar': '2'}]),
+                          [{'foo': 'ba', 'bar': 1}, {'foo': None, 'bar': 2}])
+
+        with patch('flask_restful.abort', side_effect=flask_restful.abort) as abort:
+            self.assertRaises(exceptions.BadRequest, parser.parse_many,
+                              [{'bar': '1'}, {'bar': 'x'}, {}])
+            abort.assert_called_with(400, message={1: {'bar': 'Bad bar'},
+                                                   2: {'bar': 'Bad bar'}})
+
+    @patch('flask_restful.abort')
+    def test_parse_many_strict(self, abort):
+        parser = RequestParser()
+        parser.add_argument('foo', operators=['=', '<='])
+
+        items = [{'foo': '1', 'foo<': '2'}, {'foo': '1', 'bar': '2'}]
+        parser.parse_many(items)
+        self.assertFalse(abort.called)
+        parser.parse_many(items, strict=True)
+        abort.assert_called_with(400, message={1: {'bar': 'Unknown argument'}})
+
     def test_strict_parsing_on(self):
         req = Request.from_values("/bubble?foo=baz")
         parser = RequestParser()